@@ -1,14 +1,19 @@
+# Imported first: routes registered after it can be instrumented
+from .nodes.MaxMetrics import instrument_nodes, instrument_routes
 from .nodes.MaxTesting import Max_Test # TESTING
 
 from .nodes.MaxPrompt_Loader import Max_Prompt_Loader
-from .nodes.MaxCSV_Loader import Max_CSV_Loader
+from .nodes.MaxCSV_Loader import Max_CSV_Loader, Max_CSV_Cursor_Done
 from .nodes.MaxCSV_Loader_Dynamic import Max_CSV_Loader_Dynamic
+from .nodes.MaxCSV_Lookup import Max_CSV_Lookup
 from .nodes.MaxTag_Loader import Max_Tag_Loader
 from .nodes.MaxText_Utils import \
     Max_Extract_Prompt, \
+    Max_Extract_Columns, \
     Max_Text_to_Size, \
     Max_Find_Replace, \
     Max_Text_Concat, \
+    Max_Template, \
     Max_Input
 
 __all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS', 'WEB_DIRECTORY']
@@ -18,11 +23,15 @@ NODE_CLASS_MAPPINGS = {
 
     "Max_Prompt_Loader": Max_Prompt_Loader,
     "Max_CSV_Loader": Max_CSV_Loader,
+    "Max_CSV_Cursor_Done": Max_CSV_Cursor_Done,
     "Max_CSV_Loader_Dynamic": Max_CSV_Loader_Dynamic,
+    "Max_CSV_Lookup": Max_CSV_Lookup,
     "Max_Tag_Loader": Max_Tag_Loader,
     "Max_Extract_Prompt": Max_Extract_Prompt,
+    "Max_Extract_Columns": Max_Extract_Columns,
     "Max_Find_Replace": Max_Find_Replace,
     "Max_Text_Concat": Max_Text_Concat,
+    "Max_Template": Max_Template,
     "Max_Input": Max_Input,
     "Max_Text_to_Size": Max_Text_to_Size,
 }
@@ -32,13 +41,21 @@ NODE_DISPLAY_NAME_MAPPINGS = {
 
     "Max_Prompt_Loader": "Max Prompt Loader",
     "Max_CSV_Loader": "Max CSV Loader",
+    "Max_CSV_Cursor_Done": "Max CSV Cursor Done",
     "Max_CSV_Loader_Dynamic": "Max CSV Loader (Dynamic)",
+    "Max_CSV_Lookup": "Max CSV Lookup",
     "Max_Tag_Loader": "Max Tag Loader",
     "Max_Extract_Prompt": "Max Extract Prompt",
+    "Max_Extract_Columns": "Max Extract Columns",
     "Max_Find_Replace": "Max Find & Replace",
     "Max_Text_Concat": "Max Text Concatenate",
+    "Max_Template": "Max Template",
     "Max_Input": "Max Input",
     "Max_Text_to_Size": "Max Text to Size",
 }
 
+# Timings of every node and route when MAX_NODES_METRICS is set, served on /max_nodes/metrics
+instrument_nodes(NODE_CLASS_MAPPINGS)
+instrument_routes()
+
 WEB_DIRECTORY = "./web"
\ No newline at end of file
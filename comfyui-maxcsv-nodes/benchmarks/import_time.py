@@ -0,0 +1,128 @@
+"""
+Import cost of the node pack, i.e. what it adds to ComfyUI startup.
+
+Every run imports the pack in a fresh interpreter, after the modules ComfyUI has already loaded by then
+(--preload, default: aiohttp). Reported: wall time of the import (median of the runs), the modules it
+pulled in, and the slowest ones by their own time (python -X importtime).
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeat 20 --preload aiohttp,PIL.Image --json after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PACK_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# Name the pack is imported under, its modules are reported as pack modules
+PACK_NAME = "maxcsv_nodes"
+# Printed on stderr by the child right before the pack import, -X importtime lines before it are ignored
+_MARKER = "--- maxcsv import start ---"
+
+# Run in a fresh interpreter: stub the ComfyUI server, preload, then time the pack import alone
+_CHILD = """
+import sys, json, time, types, importlib, importlib.util
+from aiohttp import web
+server = types.ModuleType("server")
+class PromptServer:
+    instance = types.SimpleNamespace(routes=web.RouteTableDef())
+server.PromptServer = PromptServer
+sys.modules["server"] = server
+for name in PRELOAD:
+    importlib.import_module(name)
+before = set(sys.modules)
+print(MARKER, file=sys.stderr, flush=True)
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location(PACK_NAME, PACK_DIR + "/__init__.py", submodule_search_locations=[PACK_DIR])
+pack = importlib.util.module_from_spec(spec)
+sys.modules[PACK_NAME] = pack
+spec.loader.exec_module(pack)
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "modules": sorted(set(sys.modules) - before), "routes": len(PromptServer.instance.routes)}))
+"""
+
+def _run_once(preload, importtime):
+    code = (_CHILD.replace("PRELOAD", repr(preload)).replace("MARKER", repr(_MARKER))
+            .replace("PACK_NAME", repr(PACK_NAME)).replace("PACK_DIR", repr(PACK_DIR)))
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    result = subprocess.run(command, capture_output=True, text=True, cwd=PACK_DIR)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing the pack failed:\n{result.stderr}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report["self_us"] = _parse_importtime(result.stderr) if importtime else {}
+    return report
+
+def _parse_importtime(stderr):
+    # "import time: self [us] | cumulative | imported package" lines after the marker -> {module: self us}
+    self_us = {}
+    _, _, lines = stderr.partition(_MARKER)
+    for line in lines.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        self_us[name.strip()] = self_us.get(name.strip(), 0) + int(own)
+    return self_us
+
+def measure(preload, repeat):
+    """
+    Returns the import report: median and all wall times, imported modules, route count and
+    the self time of each module (from one extra run under -X importtime, which slows imports down).
+    """
+    times = [_run_once(preload, False)["seconds"] for _ in range(repeat)]
+    detailed = _run_once(preload, True)
+    return {
+        "preload": preload,
+        "median_ms": statistics.median(times) * 1000,
+        "min_ms": min(times) * 1000,
+        "max_ms": max(times) * 1000,
+        "modules": detailed["modules"],
+        "routes": detailed["routes"],
+        "self_us": detailed["self_us"],
+    }
+
+def print_report(report, top, baseline=None):
+    pack_modules = [m for m in report["modules"] if m == PACK_NAME or m.startswith(PACK_NAME + ".")]
+    other_modules = [m for m in report["modules"] if m not in pack_modules]
+    line = f"Import time: {report['median_ms']:.1f}ms median (min {report['min_ms']:.1f}ms, max {report['max_ms']:.1f}ms)"
+    if baseline and baseline.get("median_ms"):
+        line += f", {report['median_ms'] / baseline['median_ms']:.2f}x the baseline ({baseline['median_ms']:.1f}ms)"
+    print(line)
+    print(f"Preloaded: {', '.join(report['preload']) or '-'}")
+    print(f"Modules imported: {len(pack_modules)} of the pack, {len(other_modules)} others; routes registered: {report['routes']}")
+    if other_modules:
+        print("Other modules: " + ", ".join(m for m in other_modules if "." not in m or m.split(".")[0] not in other_modules))
+
+    self_us = report["self_us"]
+    total = sum(self_us.values()) or 1
+    print()
+    print(f"{'module':<44} {'self':>10} {'share':>7}")
+    print("-" * 63)
+    for name, us in sorted(self_us.items(), key=lambda item: -item[1])[:top]:
+        print(f"{name:<44} {us / 1000:>8.2f}ms {us * 100 / total:>6.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10, help="fresh interpreters timed (default: 10)")
+    parser.add_argument("--preload", default="aiohttp", help="comma-separated modules imported before the pack, as ComfyUI has them loaded already (default: aiohttp)")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules listed (default: 15)")
+    parser.add_argument("--json", default="", help="write the report to this JSON file")
+    parser.add_argument("--compare", default="", help="JSON report of an earlier run to compare the median with")
+    args = parser.parse_args()
+
+    preload = [name.strip() for name in args.preload.split(",") if name.strip()]
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    report = measure(preload, max(1, args.repeat))
+    print_report(report, args.top, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
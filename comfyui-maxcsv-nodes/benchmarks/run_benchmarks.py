@@ -0,0 +1,350 @@
+"""
+Benchmarks for the loaders, the CSV row route and the text utilities, without a ComfyUI server.
+
+Synthetic CSV files, tag files and prompt directories are generated at each scale, then every case
+is run --repeat times. Reported per case: time of the first run, latency percentiles of the
+following runs, throughput, and peak memory (tracemalloc) twice: cold, of the first call in a fresh
+interpreter with every cache of the pack empty, and warm, of one more call after the timed runs.
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --scales 1k,100k,1m --json after.json --compare before.json
+    python benchmarks/run_benchmarks.py --only csv_loader --repeat 50
+
+--pack benchmarks another checkout of the pack (e.g. a git worktree of an older commit) with this script.
+Cases using options the checked-out nodes don't have (seeds, ranges, filter syntax...) are skipped there,
+so both runs can be compared with --compare.
+
+    git worktree add /tmp/maxcsv-before <commit>
+    python benchmarks/run_benchmarks.py --pack /tmp/maxcsv-before/comfyui-maxcsv-nodes --json before.json
+    python benchmarks/run_benchmarks.py --json after.json --compare before.json
+"""
+import argparse
+import gc
+import importlib.util
+import inspect
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+PACK_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# Rows (CSV), lines (tags) and files (prompts) generated for each scale name
+SCALES = {"1k": 1000, "10k": 10000, "100k": 100000, "1m": 1000000}
+# Prompt directories are capped: a million small files says more about the file system than the loader
+PROMPT_FILES_MAX = 10000
+# Texts cleaned per clean_text run
+CLEAN_TEXT_BATCH = 1000
+
+_WORDS = ("portrait photo cinematic lighting forest castle dragon city night neon rain sunset ocean "
+          "mountain studio soft light bokeh vintage film grain watercolor oil painting sketch golden hour "
+          "highly detailed sharp focus wide angle macro dramatic moody pastel vibrant").split()
+_CATEGORIES = ("photo", "art", "3d", "anime", "sketch", "pixel")
+
+def _stub_server():
+    # The nodes register their routes on PromptServer.instance.routes at import time
+    if "server" in sys.modules:
+        return
+    from aiohttp import web
+    server = types.ModuleType("server")
+
+    class PromptServer:
+        instance = types.SimpleNamespace(routes=web.RouteTableDef())
+
+    server.PromptServer = PromptServer
+    sys.modules["server"] = server
+
+def _import_pack(pack_dir=PACK_DIR):
+    _stub_server()
+    spec = importlib.util.spec_from_file_location("maxcsv_nodes", os.path.join(pack_dir, "__init__.py"), submodule_search_locations=[pack_dir])
+    pack = importlib.util.module_from_spec(spec)
+    sys.modules["maxcsv_nodes"] = pack
+    spec.loader.exec_module(pack)
+    return pack
+
+def _prompt(rng):
+    words = rng.sample(_WORDS, rng.randint(6, 14))
+    # A few untidy commas and spaces, as typed by hand, for clean_text
+    return " , ".join(", ".join(words[i:i + 3]) for i in range(0, len(words), 3)) + " ."
+
+def generate_data(workdir, scales, seed=0):
+    """
+    Writes csv/bench_<scale>.csv, tags/bench_<scale>.txt and prompts/bench_<scale>/ under workdir.
+    Existing files are reused.
+    """
+    rng = random.Random(seed)
+    for name in scales:
+        count = SCALES[name]
+        csv_file = os.path.join(workdir, "csv", f"bench_{name}.csv")
+        if not os.path.exists(csv_file):
+            os.makedirs(os.path.dirname(csv_file), exist_ok=True)
+            with open(csv_file, "w", encoding="utf-8", newline="") as f:
+                f.write("filename;prompt;category;weight\n")
+                for i in range(count):
+                    f.write(f"image_{i:07d};\"{_prompt(rng)}\";{rng.choice(_CATEGORIES)};{rng.randint(1, 10)}\n")
+        tags_file = os.path.join(workdir, "tags", f"bench_{name}.txt")
+        if not os.path.exists(tags_file):
+            os.makedirs(os.path.dirname(tags_file), exist_ok=True)
+            with open(tags_file, "w", encoding="utf-8") as f:
+                f.writelines(f"{' '.join(rng.sample(_WORDS, 2))} {i}\n" for i in range(count))
+        prompt_dir = os.path.join(workdir, "prompts", f"bench_{name}")
+        if not os.path.isdir(prompt_dir):
+            os.makedirs(prompt_dir)
+            for i in range(min(count, PROMPT_FILES_MAX)):
+                with open(os.path.join(prompt_dir, f"prompt_{i:05d}.txt"), "w", encoding="utf-8") as f:
+                    f.write(_prompt(rng))
+
+def _accepts(method, *names):
+    # True when method takes every keyword argument of names
+    parameters = inspect.signature(method).parameters
+    return all(name in parameters for name in names)
+
+def _selection_types(node_class):
+    try:
+        return node_class.INPUT_TYPES()["required"]["selection_type"][0]
+    except Exception:
+        return []
+
+def build_cases(pack, workdir, scales):
+    """
+    Returns [(name, scale, items per call, function)] for the cases the imported pack supports.
+    """
+    modules = sys.modules
+    csv_module = modules["maxcsv_nodes.nodes.MaxCSV_Loader"]
+    tag_module = modules["maxcsv_nodes.nodes.MaxTag_Loader"]
+    prompt_module = modules["maxcsv_nodes.nodes.MaxPrompt_Loader"]
+    text_module = modules["maxcsv_nodes.nodes.MaxText_Utils"]
+    csv_module.csv_path = os.path.join(workdir, "csv")
+    tag_module.tags_path = os.path.join(workdir, "tags")
+    prompt_module.prompts_path = os.path.join(workdir, "prompts")
+
+    csv_loader = pack.NODE_CLASS_MAPPINGS["Max_CSV_Loader"]()
+    tag_loader = pack.NODE_CLASS_MAPPINGS["Max_Tag_Loader"]()
+    prompt_loader = pack.NODE_CLASS_MAPPINGS["Max_Prompt_Loader"]()
+
+    csv_types = _selection_types(type(csv_loader))
+    has_emit_batch = _accepts(csv_loader.browse_csv, "emit_batch")
+    has_seed = _accepts(csv_loader.browse_csv, "seed", "sampling", "weight_column")
+    has_range = "range" in csv_types and _accepts(csv_loader.browse_csv, "emit_batch")
+    has_resume = "resume" in csv_types and _accepts(csv_loader.browse_csv, "cursor_name")
+    # Filters with AND/OR, -word and column:word; older code only matches a single word as a substring
+    has_filter_syntax = "maxcsv_nodes.nodes.MaxText_Filter" in modules
+    batch = {"emit_batch": True} if has_emit_batch else {}
+
+    cases = []
+    for name in scales:
+        count = SCALES[name]
+        csv_file = f"bench_{name}.csv"
+        csv_full_path = os.path.join(workdir, "csv", csv_file)
+        tags_file = f"bench_{name}.txt"
+        prompt_dir = f"bench_{name}"
+        # Every run of the resume case claims a new row
+        if os.path.exists(csv_full_path + ".cursor.jsonl"):
+            os.remove(csv_full_path + ".cursor.jsonl")
+        seeds = iter(range(10 ** 9))
+        positions = iter(range(10 ** 9))
+
+        # (name, scale, items per call, function, supported by the imported pack)
+        cases += [case[:4] for case in [
+            ("csv_loader/single", name, 1, lambda f=csv_file: csv_loader.browse_csv(f, "single", "5", emit_batch=False), has_emit_batch),
+            ("csv_loader/single+batch", name, count, lambda f=csv_file: csv_loader.browse_csv(f, "single", "5", **batch), True),
+            ("csv_loader/random", name, 1, lambda f=csv_file: csv_loader.browse_csv(f, "random"), True),
+            ("csv_loader/random_seeded", name, 1, lambda f=csv_file: csv_loader.browse_csv(f, "random", seed=next(seeds)), has_seed),
+            ("csv_loader/random_weighted", name, 1, lambda f=csv_file: csv_loader.browse_csv(f, "random", seed=next(seeds), sampling="weighted", weight_column="weight"), has_seed),
+            ("csv_loader/iterate", name, 1, lambda f=csv_file: csv_loader.browse_csv(f, "iterate", iteration_index=next(positions) % count, emit_batch=False), has_emit_batch),
+            ("csv_loader/range_16", name, 16, lambda f=csv_file: csv_loader.browse_csv(f, "range", iteration_index=next(positions) * 16 % count), has_range),
+            ("csv_loader/filter_word", name, 1, lambda f=csv_file: csv_loader.browse_csv(f, "random", filter_text="castle"), True),
+            ("csv_loader/filter", name, 1, lambda f=csv_file: csv_loader.browse_csv(f, "random", filter_text="castle -night"), has_filter_syntax),
+            ("csv_loader/resume", name, 1, lambda f=csv_file: csv_loader.browse_csv(f, "resume", cursor_name="bench"), has_resume),
+            ("get_rows_from_csv/all", name, count, lambda p=csv_full_path: csv_module.get_rows_from_csv(p), True),
+            ("get_rows_from_csv/filter_word", name, 1, lambda p=csv_full_path: csv_module.get_rows_from_csv(p, "dragon"), True),
+            ("get_rows_from_csv/filter", name, 1, lambda p=csv_full_path: csv_module.get_rows_from_csv(p, "dragon OR category:anime"), has_filter_syntax),
+            ("tag_loader/single", name, 1, lambda f=tags_file: tag_loader.browse_tags(f, "single", "5"), True),
+            ("tag_loader/random", name, 1, lambda f=tags_file: tag_loader.browse_tags(f, "random"), True),
+            ("tag_loader/filter", name, 1, lambda f=tags_file: tag_loader.browse_tags(f, "random", filter_text="castle"), True),
+            ("prompt_loader/single", name, 1, lambda d=prompt_dir: prompt_loader.browse_files(d, "single", "prompt_00005.txt"), True),
+            ("prompt_loader/random", name, 1, lambda d=prompt_dir: prompt_loader.browse_files(d, "random"), True),
+            ("prompt_loader/filter", name, 1, lambda d=prompt_dir: prompt_loader.browse_files(d, "random", filter_text="00"), True),
+        ] if case[4]]
+
+    rng = random.Random(1)
+    texts = [_prompt(rng) for _ in range(CLEAN_TEXT_BATCH)]
+    clean_text = text_module.clean_text
+
+    def clean_cold():
+        # Memoized results would hide the cleaning itself
+        getattr(clean_text, "cache_clear", lambda: None)()
+        return [clean_text(text) for text in texts]
+
+    cases += [
+        ("clean_text/cold", "-", CLEAN_TEXT_BATCH, clean_cold),
+        ("clean_text/warm", "-", CLEAN_TEXT_BATCH, lambda: [clean_text(text) for text in texts]),
+    ]
+    return cases
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+def run_case(function, items, repeat):
+    """
+    Returns the measurements of one case, times in milliseconds.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    function()
+    first = time.perf_counter() - start
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    # tracemalloc slows allocations down, so peak memory is measured in a run of its own
+    peak = _peak_memory(function)
+
+    mean = statistics.mean(times)
+    return {
+        "first_ms": first * 1000,
+        "mean_ms": mean * 1000,
+        "min_ms": min(times) * 1000,
+        "p50_ms": _percentile(times, 0.5) * 1000,
+        "p90_ms": _percentile(times, 0.9) * 1000,
+        "p99_ms": _percentile(times, 0.99) * 1000,
+        "max_ms": max(times) * 1000,
+        "items_per_s": items / mean if mean > 0 else None,
+        "warm_peak_kb": peak / 1024,
+    }
+
+def _peak_memory(function):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def cold_peak_kb(pack_dir, workdir, case, scale):
+    """
+    Peak memory in KB of the first call of a case, in a fresh interpreter: loading and parsing the
+    files and filling the caches are counted, as on the first use after ComfyUI starts.
+    """
+    command = [sys.executable, os.path.abspath(__file__), "--pack", pack_dir, "--workdir", workdir, "--cold-case", case, "--cold-scale", scale]
+    result = subprocess.run(command, capture_output=True, text=True, cwd=pack_dir)
+    if result.returncode != 0:
+        raise RuntimeError(f"cold run of {case} ({scale}) failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])["cold_peak_kb"]
+
+def _run_cold_case(pack_dir, workdir, case, scale):
+    # Child of cold_peak_kb: the pack is imported and the case built, then only its first call is measured
+    pack = _import_pack(pack_dir)
+    scales = [] if scale == "-" else [scale]
+    for name, case_scale, _, function in build_cases(pack, workdir, scales):
+        if name == case and case_scale == scale:
+            print(json.dumps({"cold_peak_kb": _peak_memory(function) / 1024}))
+            return
+    raise SystemExit(f"unknown case {case} ({scale})")
+
+def _git_revision(pack_dir):
+    # Worktrees have a .git file instead of a folder, git itself finds their HEAD
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=pack_dir)
+    except OSError:
+        return None
+    return result.stdout.strip()[:12] if result.returncode == 0 else None
+
+def _kb(value):
+    return f"{value:>10.0f}" if value is not None else f"{'-':>10}"
+
+def print_results(results, baseline=None):
+    previous = {(r["case"], r["scale"]): r for r in (baseline or {}).get("results", [])}
+    header = f"{'case':<28} {'scale':>5} {'first':>10} {'p50':>10} {'p90':>10} {'p99':>10} {'items/s':>12} {'cold KB':>10} {'warm KB':>10}"
+    if previous:
+        header += f" {'p50 vs base':>12}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        line = (f"{r['case']:<28} {r['scale']:>5} {r['first_ms']:>8.2f}ms {r['p50_ms']:>8.3f}ms {r['p90_ms']:>8.3f}ms "
+                f"{r['p99_ms']:>8.3f}ms {r['items_per_s'] or 0:>12.0f} {_kb(r.get('cold_peak_kb'))} {_kb(r.get('warm_peak_kb'))}")
+        base = previous.get((r["case"], r["scale"]))
+        if base and base["p50_ms"] > 0:
+            line += f" {r['p50_ms'] / base['p50_ms']:>11.2f}x"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1k,100k", help=f"comma-separated, from {', '.join(SCALES)} (default: 1k,100k)")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per case after the first one (default: 20)")
+    parser.add_argument("--only", default="", help="run only the cases whose name contains this text")
+    parser.add_argument("--workdir", default="", help="directory for the generated data, reused between runs (default: a temporary directory)")
+    parser.add_argument("--json", default="", help="write the results to this JSON file")
+    parser.add_argument("--compare", default="", help="JSON file of an earlier run to compare p50 latencies with")
+    parser.add_argument("--pack", default=PACK_DIR, help="node pack folder to benchmark (default: the one this script is in)")
+    parser.add_argument("--no-cold", action="store_true", help="skip the cold memory runs, one fresh interpreter per case")
+    parser.add_argument("--cold-case", default="", help=argparse.SUPPRESS)
+    parser.add_argument("--cold-scale", default="", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_case:
+        _run_cold_case(args.pack, args.workdir, args.cold_case, args.cold_scale)
+        return
+
+    scales = [s.strip().lower() for s in args.scales.split(",") if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="maxcsv_bench_")
+    try:
+        print(f"Generating data in {workdir}...", file=sys.stderr)
+        generate_data(workdir, scales)
+        pack_dir = os.path.abspath(args.pack)
+        pack = _import_pack(pack_dir)
+        results = []
+        for case, scale, items, function in build_cases(pack, workdir, scales):
+            if args.only and args.only not in case:
+                continue
+            print(f"  {case} ({scale})", file=sys.stderr)
+            result = {"case": case, "scale": scale, "items": items, **run_case(function, items, max(1, args.repeat))}
+            result["cold_peak_kb"] = None if args.no_cold else cold_peak_kb(pack_dir, workdir, case, scale)
+            results.append(result)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results, baseline)
+    if args.json:
+        report = {
+            "meta": {
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "pack": pack_dir,
+                "revision": _git_revision(pack_dir),
+                "scales": scales,
+                "repeat": args.repeat,
+            },
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import os
+import csv
+import threading
+from collections import OrderedDict
+from .MaxText_Filter import TextIndex
+from .MaxCSV_Columns import ColumnStore
+from .MaxCSV_Dialect import detect_format
+from .MaxMetrics import inc, cache_lookup, span
+
+# Total size (in source file bytes) of parsed files kept in memory
+CSV_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Filter-dependent data (sampling plans, cursor keys...) kept per table, the most recently used first
+FILTERED_CACHE_SIZE = 16
+
+def file_version(path):
+    """
+    Returns (absolute path, mtime in ns, size) for a file.
+    Any change to the file on disk produces a different version.
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    return (path, st.st_mtime_ns, st.st_size)
+
+class FileCache:
+    """
+    Process-wide LRU cache of objects built from files, keyed on file version.
+    Eviction is driven by the total size of the source files, or by sizeof(value) if given.
+    name: label of the cache in the metrics
+    """
+    def __init__(self, max_bytes, sizeof=None, name="files"):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.name = name
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, loader):
+        version = file_version(path)
+        key = version[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                cache_lookup(self.name, True)
+                return entry[1]
+
+        cache_lookup(self.name, False)
+        with span(f"load/{self.name}"):
+            value = loader(version)
+        cost = self.sizeof(value) if self.sizeof else version[2]
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[2]
+            # Values larger than the whole budget are returned but never kept
+            if cost <= self.max_bytes:
+                self._entries[key] = (version, value, cost)
+                self.total_bytes += cost
+                while self.total_bytes > self.max_bytes:
+                    _, (_, _, old_cost) = self._entries.popitem(last=False)
+                    self.total_bytes -= old_cost
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+class CSVTable:
+    """
+    Parsed CSV file shared between nodes and routes. Treat as read-only.
+    headers: first row as read from the file (not stripped)
+    rows: data rows with empty rows removed, as a ColumnStore (SnapshotRows for large files).
+          Both index like a list of rows; convert rows with list() before serializing them.
+    """
+    def __init__(self, version, headers, rows, dialect):
+        self.version = version
+        self.path = version[0]
+        self.headers = headers
+        self.rows = rows
+        self.dialect = dialect
+        self.field_names = [h.strip() for h in headers]
+        self._derived = {}
+        self._filtered = OrderedDict()
+        self._lock = threading.Lock()
+
+    def derived(self, key, factory):
+        # Memoize data computed from this version of the table (indexes, formatted rows...)
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = factory(self)
+            return self._derived[key]
+
+    def filtered(self, key, factory):
+        # Like derived(), for data built per filter text: every filter typed would otherwise stay in memory
+        with self._lock:
+            if key in self._filtered:
+                self._filtered.move_to_end(key)
+            else:
+                self._filtered[key] = factory(self)
+                if len(self._filtered) > FILTERED_CACHE_SIZE:
+                    self._filtered.popitem(last=False)
+            return self._filtered[key]
+
+    def search(self, filter_text):
+        # Ids of the rows matching filter_text, see MaxText_Filter.parse_filter for the syntax
+        return self.derived("text_index", lambda table: TextIndex(table.field_names, table.rows)).search(filter_text)
+
+    def column(self, index):
+        # Values of one column ("" where a row is shorter), decoded straight from the snapshot when there is one
+        def build(table):
+            if hasattr(table.rows, "column"):
+                return table.rows.column(index)
+            return [row[index] if index < len(row) else "" for row in table.rows]
+        return self.derived(("column", index), build)
+
+    def sorted_ids(self, column):
+        # Row ids ordered by the text of one column (case-insensitive), built once per table version
+        values = self.column(column)
+        def build(table):
+            lowered = [value.lower() for value in values]
+            return sorted(range(len(lowered)), key=lowered.__getitem__)
+        return self.derived(("sorted_ids", column), build)
+
+    def format_row(self, i):
+        # "header:\n\nvalue" text of row i, built once per table version
+        formatted = self.derived("formatted_rows", lambda table: [None] * len(table.rows))
+        text = formatted[i]
+        if text is None:
+            text = formatted[i] = format_row(self.field_names, self.rows[i])
+        return text
+
+def format_row(headers, row):
+    """
+    Formats a row as "header:\n\nvalue" blocks, the text layout used by the CSV loader outputs.
+    """
+    parts = []
+    for i, h in enumerate(headers):
+        parts.append(f"{h}:\n\n{row[i] if i < len(row) else ''}\n\n")
+    return "".join(parts).strip()
+
+def _parse_csv(version):
+    # Imported on the first parse: the snapshot module is not needed to start ComfyUI
+    from .MaxCSV_Snapshot import SNAPSHOT_MIN_BYTES, load_snapshot, write_snapshot
+
+    # Large files are mapped from their snapshot, written the first time the file is parsed
+    use_snapshot = version[2] >= SNAPSHOT_MIN_BYTES
+    if use_snapshot:
+        snapshot = load_snapshot(version)
+        cache_lookup("csv_snapshot", snapshot is not None)
+        if snapshot is not None:
+            return CSVTable(version, *snapshot)
+
+    csv_format = detect_format(version)
+    dialect = csv_format.dialect
+    with open(version[0], "r", encoding=csv_format.encoding) as f:
+        reader = list(csv.reader(f, dialect))
+    inc("bytes_read_total", "csv", version[2])
+    if not reader:
+        return CSVTable(version, [], ColumnStore([]), dialect)
+    rows = [row for row in reader[1:] if any(cell and cell.strip() for cell in row)]
+    if use_snapshot:
+        write_snapshot(version, reader[0], rows, dialect)
+    return CSVTable(version, reader[0], ColumnStore(rows), dialect)
+
+_table_cache = FileCache(CSV_CACHE_MAX_BYTES, name="csv_table")
+
+def load_csv_table(path):
+    """
+    Returns the parsed CSVTable for path, re-parsing only when the file changed.
+    Raises the underlying exception if the file can't be read.
+    """
+    return _table_cache.get(path, _parse_csv)
@@ -0,0 +1,112 @@
+from array import array
+
+# Columns with at most this share of distinct values are dictionary-encoded
+DICTIONARY_MAX_RATIO = 0.5
+
+def _code_type(count):
+    if count <= 0xff:
+        return "B"
+    if count <= 0xffff:
+        return "H"
+    return "I"
+
+class RowView:
+    """
+    One row of a ColumnStore. Supports len(), indexing (slices give lists), iteration and comparison like a row list.
+    Use list(row) where a real list is needed, e.g. for JSON.
+    """
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    def __len__(self):
+        return self._store.row_length(self._index)
+
+    def __getitem__(self, j):
+        if isinstance(j, slice):
+            return [self._store.cell(self._index, k) for k in range(*j.indices(len(self)))]
+        length = len(self)
+        if j < 0:
+            j += length
+        if j < 0 or j >= length:
+            raise IndexError("cell index out of range")
+        return self._store.cell(self._index, j)
+
+    def __iter__(self):
+        return iter(self._store.row_list(self._index))
+
+    def __eq__(self, other):
+        if isinstance(other, (RowView, list, tuple)):
+            return self._store.row_list(self._index) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self._store.row_list(self._index))
+
+class ColumnStore:
+    """
+    Rows of a parsed CSV file stored column by column.
+    Equal cell values share one string object, and columns with few distinct values
+    (categories, repeated negative prompts...) keep 1-4 byte codes into a list of values.
+    Supports len(), indexing and iteration like a list of rows; rows are RowView objects.
+    """
+    def __init__(self, rows):
+        self._length = len(rows)
+        width = max((len(row) for row in rows), default=0)
+        lengths = [len(row) for row in rows]
+        # Row lengths are only kept for files with rows of different lengths
+        self._lengths = array(_code_type(width), lengths) if any(n != width for n in lengths) else None
+        self._width = width
+        if self._lengths is not None:
+            rows = [row + [""] * (width - len(row)) if len(row) < width else row for row in rows]
+        # Each column is (values, codes): codes[i] indexes values, or codes is None and values holds every cell
+        self._columns = []
+        pool = {}
+        for cells in zip(*rows):
+            distinct = dict.fromkeys(cells)
+            if len(distinct) <= DICTIONARY_MAX_RATIO * len(cells):
+                # Values repeated in several columns share one string object
+                values = [pool.setdefault(value, value) for value in distinct]
+                codes_by_value = dict(zip(distinct, range(len(values))))
+                codes = array(_code_type(len(values)), map(codes_by_value.__getitem__, cells))
+                self._columns.append((values, codes))
+            else:
+                # Equal cells share the string object of their first occurrence
+                first = dict(zip(distinct, distinct))
+                self._columns.append((list(map(first.__getitem__, cells)), None))
+
+    def __len__(self):
+        return self._length
+
+    def row_length(self, i):
+        return self._width if self._lengths is None else self._lengths[i]
+
+    def cell(self, i, j):
+        values, codes = self._columns[j]
+        return values[i] if codes is None else values[codes[i]]
+
+    def row_list(self, i):
+        # Row i as a new list
+        return [self.cell(i, j) for j in range(self.row_length(i))]
+
+    def column(self, j):
+        # All cells of column j as a list ("" where a row is shorter)
+        values, codes = self._columns[j]
+        return list(values) if codes is None else [values[code] for code in codes]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(self._length))]
+        if i < 0:
+            i += self._length
+        if i < 0 or i >= self._length:
+            raise IndexError("row index out of range")
+        return RowView(self, i)
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield RowView(self, i)
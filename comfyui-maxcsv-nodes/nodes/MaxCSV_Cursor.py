@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import socket
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Appended to the CSV file name for the cursor file kept next to it
+CURSOR_SUFFIX = ".cursor.jsonl"
+
+_states = {}
+_states_lock = threading.Lock()
+
+def cursor_path(csv_file):
+    return csv_file + CURSOR_SUFFIX
+
+@contextmanager
+def _locked(f):
+    # Exclusive lock on the cursor file, shared with other processes and ComfyUI instances
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class RowKeys:
+    """
+    Cursor keys of the matching rows in order, and the position of each key.
+    A row is recorded by its filename when there's a filename column, else by its row id as #<id>;
+    rows repeating a filename seen before are recorded by row id as well.
+    """
+    def __init__(self):
+        self.keys = []
+        self.positions = {}
+        # False while more() can still read keys
+        self.complete = True
+
+    def add(self, row_id, filename=""):
+        key = filename.strip()
+        if not key or key in self.positions:
+            key = f"#{row_id}"
+        self.keys.append(key)
+        self.positions[key] = len(self.keys) - 1
+
+    def more(self):
+        """
+        Reads more keys, returns False when there were none left.
+        """
+        return False
+
+class _Cursor:
+    """
+    Rows of one cursor: keys done, keys claimed but not done yet (oldest claim first),
+    and the next position to look at in the keys it was last asked about.
+    """
+    __slots__ = ("done", "claims", "keys", "next")
+
+    def __init__(self):
+        self.done = set()
+        self.claims = OrderedDict()
+        self.keys = None
+        self.next = 0
+
+    def record(self, record):
+        key = record["key"]
+        # Records written before claims were tracked are done records
+        if record.get("state", "done") == "done":
+            self.done.add(key)
+            self.claims.pop(key, None)
+        elif key not in self.done:
+            self.claims.pop(key, None)
+            self.claims[key] = float(record.get("time", 0))
+
+    def next_position(self, keys, timeout, now):
+        # Claims older than timeout are retried first
+        if timeout > 0:
+            for key, claimed in self.claims.items():
+                if claimed > now - timeout:
+                    break
+                position = keys.positions.get(key)
+                if position is not None:
+                    return position
+        # Every key before self.next is done or claimed already
+        if self.keys is not keys:
+            self.keys, self.next = keys, 0
+        loaded = keys.keys
+        while self.next < len(loaded) and (loaded[self.next] in self.done or loaded[self.next] in self.claims):
+            self.next += 1
+        return self.next if self.next < len(loaded) else None
+
+class _CursorState:
+    """
+    Cursors of a cursor file, read from the file up to offset.
+    """
+    def __init__(self, file_id):
+        self.file_id = file_id
+        self.offset = 0
+        self.cursors = {}
+
+    def cursor(self, name):
+        if name not in self.cursors:
+            self.cursors[name] = _Cursor()
+        return self.cursors[name]
+
+    def read_new(self, f):
+        f.seek(self.offset)
+        data = f.read()
+        # A line without newline was cut short by a crash, it's read again once completed
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line.decode("utf-8"))
+                self.cursor(record["cursor"]).record(record)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                continue
+        self.offset += end
+
+    def append(self, f, size, record):
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        if size > self.offset:
+            # Start a new line after the one cut short
+            line = b"\n" + line
+        f.seek(0, os.SEEK_END)
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+        self.cursor(record["cursor"]).record(record)
+        # The line just written was read by this process already
+        self.offset = f.tell()
+
+@contextmanager
+def _cursor_file(csv_file):
+    # The cursor file locked and its state read up to date: (file, size, state)
+    path = cursor_path(csv_file)
+    with _states_lock, open(path, "a+b") as f, _locked(f):
+        st = os.fstat(f.fileno())
+        file_id = (st.st_dev, st.st_ino)
+        state = _states.get(path)
+        if state is None or state.file_id != file_id or st.st_size < state.offset:
+            state = _states[path] = _CursorState(file_id)
+        state.read_new(f)
+        yield f, st.st_size, state
+
+def _record(cursor, key, state):
+    return {"cursor": cursor, "key": key, "state": state, "time": time.time(), "host": socket.gethostname(), "pid": os.getpid()}
+
+def claim_next(csv_file, cursor, keys, timeout=0):
+    """
+    Claims the first key of keys (RowKeys) neither done nor claimed by cursor and returns its position,
+    or None when every key was taken. With a timeout (seconds), claims not marked done by then are
+    claimed again, oldest first; without one a claim is final.
+    Claims are appended to the cursor file under an exclusive file lock, so several
+    ComfyUI instances sharing the file never get the same row, and a restarted sweep resumes
+    after the rows already taken. Delete the cursor file (or use another cursor name) to start over.
+    """
+    while True:
+        with _cursor_file(csv_file) as (f, size, state):
+            position = state.cursor(cursor).next_position(keys, timeout, time.time())
+            if position is not None:
+                state.append(f, size, _record(cursor, keys.keys[position], "claimed"))
+                return position
+            if keys.complete:
+                return None
+        # Every key read so far was taken: read more outside the lock
+        keys.more()
+
+def mark_done(csv_file, cursor, key):
+    """
+    Records the row key claimed by cursor as done, it's never claimed again.
+    """
+    with _cursor_file(csv_file) as (f, size, state):
+        if key not in state.cursor(cursor).done:
+            state.append(f, size, _record(cursor, key, "done"))
+
+def table_row_keys(table, row_ids, filter_text=""):
+    """
+    RowKeys of the rows row_ids of a CSVTable, kept with the table version for recent filters.
+    """
+    lower_headers = [h.lower() for h in table.field_names]
+    filenames = table.column(lower_headers.index('filename')) if 'filename' in lower_headers else None
+
+    def build(table):
+        keys = RowKeys()
+        for row_id in row_ids:
+            keys.add(row_id, filenames[row_id] if filenames is not None else "")
+        return keys
+
+    return table.filtered(("cursor_keys", filter_text), build)
@@ -0,0 +1,104 @@
+import codecs
+import csv
+import threading
+from collections import OrderedDict
+from .MaxMetrics import inc, cache_lookup
+
+# Bytes read from the start of a file to detect its encoding and dialect
+DETECT_SAMPLE_BYTES = 64 * 1024
+# Delimiters the dialect is chosen from
+DETECT_DELIMITERS = ",;\t|"
+# Detected formats kept (one per file version)
+FORMAT_CACHE_SIZE = 256
+
+# UTF-32 first: its little-endian BOM starts with the UTF-16 one
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+# Encodings tried in order for files without BOM, latin-1 accepts any bytes
+_FALLBACK_ENCODINGS = ("utf-8", "cp1252")
+
+_formats = OrderedDict()
+_formats_lock = threading.Lock()
+
+class CSVFormat:
+    """
+    How a CSV file is read: the encoding to open it with and the csv dialect.
+    ascii_compatible: newlines, quotes and delimiters are single ASCII bytes, so the file can be scanned as bytes.
+    bom_length: bytes to skip before the first record when reading raw bytes.
+    """
+    def __init__(self, encoding, dialect, bom_length=0):
+        self.encoding = encoding
+        self.dialect = dialect
+        self.bom_length = bom_length
+        self.ascii_compatible = encoding not in ("utf-16", "utf-32")
+
+def _detect_encoding(sample, complete):
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding, len(bom)
+    for encoding in _FALLBACK_ENCODINGS:
+        try:
+            # A character cut at the end of the sample is not an error
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=complete)
+        except UnicodeDecodeError:
+            continue
+        # utf-8-sig reads files without BOM the same as utf-8
+        return ("utf-8-sig" if encoding == "utf-8" else encoding), 0
+    return "latin-1", 0
+
+def sniff_dialect(text):
+    """
+    Guesses the dialect of CSV text, falling back to its first line, then to the excel dialect.
+    Only the delimiter and spacing are sniffed: quoting always follows Excel ("" inside "quoted cells"),
+    as apostrophes in prose make the sniffer guess ' as the quote character.
+    """
+    first_line = text.split("\n", 1)[0]
+    for candidate in (text, first_line):
+        try:
+            sniffed = csv.Sniffer().sniff(candidate, delimiters=DETECT_DELIMITERS)
+        except csv.Error:
+            continue
+
+        class SniffedDialect(csv.excel):
+            delimiter = sniffed.delimiter
+            skipinitialspace = sniffed.skipinitialspace
+        return SniffedDialect
+    return csv.excel
+
+def _detect(path):
+    with open(path, "rb") as f:
+        sample = f.read(DETECT_SAMPLE_BYTES + 1)
+    inc("bytes_read_total", "csv_sniff", len(sample))
+    complete = len(sample) <= DETECT_SAMPLE_BYTES
+    sample = sample[:DETECT_SAMPLE_BYTES]
+    encoding, bom_length = _detect_encoding(sample, complete)
+
+    text = sample.decode(encoding, errors="ignore").replace("\r\n", "\n").replace("\r", "\n")
+    if not complete and "\n" in text:
+        # Only sniff whole lines
+        text = text[:text.rindex("\n") + 1]
+    return CSVFormat(encoding, sniff_dialect(text), bom_length)
+
+def detect_format(version):
+    """
+    Returns the CSVFormat of a file version (see MaxCSV_Cache.file_version), detected once per version.
+    Every CSV reader goes through this, so nodes and routes read a file the same way.
+    """
+    with _formats_lock:
+        detected = _formats.get(version)
+        if detected is not None:
+            _formats.move_to_end(version)
+    cache_lookup("csv_format", detected is not None)
+    if detected is not None:
+        return detected
+    detected = _detect(version[0])
+    with _formats_lock:
+        _formats[version] = detected
+        if len(_formats) > FORMAT_CACHE_SIZE:
+            _formats.popitem(last=False)
+    return detected
@@ -0,0 +1,152 @@
+import io
+import re
+import codecs
+import csv
+import mmap
+from array import array
+from .MaxCSV_Cache import FileCache, file_version
+from .MaxCSV_Dialect import detect_format
+from .MaxMetrics import inc
+
+# Memory budget for row offset indexes (8 bytes per row)
+ROW_INDEX_MAX_BYTES = 64 * 1024 * 1024
+
+_DECODE_CHUNK = 1024 * 1024
+
+def _decode(data, encoding):
+    # Same newline translation as opening the file in text mode
+    return data.decode(encoding).replace("\r\n", "\n").replace("\r", "\n")
+
+def can_index(path):
+    """
+    True when the rows of path can be found by scanning its bytes (any encoding but UTF-16/32, no escape character).
+    """
+    try:
+        csv_format = detect_format(file_version(path))
+        return csv_format.ascii_compatible and not csv_format.dialect.escapechar
+    except OSError:
+        return False
+
+class CSVRowIndex:
+    """
+    Byte offsets of every non-empty data record in a CSV file.
+    Rows are read on demand with a single seek, so only the offsets stay in memory.
+    Supports len() and indexing like the rows list of a CSVTable.
+    """
+    def __init__(self, version, headers, dialect, offsets, encoding="utf-8"):
+        self.version = version
+        self.path = version[0]
+        self.headers = headers
+        self.dialect = dialect
+        self.encoding = encoding
+        # offsets[i] is the start of row i, the last item is the end of the file
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError("row index out of range")
+        start = self.offsets[i]
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            data = f.read(self.offsets[i + 1] - start)
+        return next(csv.reader(io.StringIO(_decode(data, self.encoding)), self.dialect), [])
+
+def _record_pattern(dialect, encoding):
+    """
+    Matches one record the way the csv module reads it: a quote only opens a quoted cell at the start of
+    the cell (anywhere else it's a plain character), newlines inside quoted cells don't end the record,
+    and \r\n, \n or a lone \r end it, like text mode reads the file.
+    """
+    d = re.escape(dialect.delimiter.encode(encoding))
+    newline = rb"(?:\r\n|\r|\n|\Z)"
+    if not dialect.quotechar or dialect.quoting == csv.QUOTE_NONE:
+        return re.compile(b"[^\r\n]*" + newline)
+    q = re.escape(dialect.quotechar.encode(encoding))
+    # Text after the closing quote is plain, up to the delimiter
+    quoted = q + (b"(?:[^" + q + b"]|" + q + q + b")*" if dialect.doublequote else b"[^" + q + b"]*") + q + b"(?!" + q + b")[^" + d + b"\r\n]*"
+    if dialect.skipinitialspace:
+        # Spaces before a cell are skipped, a quote after them still opens a quoted cell
+        cell = b" *(?:" + quoted + b"|(?![ " + q + b"])[^" + d + b"\r\n]*)"
+    else:
+        cell = b"(?:" + quoted + b"|(?!" + q + b")[^" + d + b"\r\n]*)"
+    return re.compile(cell + b"(?:" + d + cell + b")*" + newline)
+
+def _iter_records(mm, start, dialect, encoding):
+    """
+    Yields (start, end) byte ranges of the records in mm.
+    A newline inside a quoted cell does not end the record.
+    """
+    record = _record_pattern(dialect, encoding)
+    size = len(mm)
+    pos = start
+    while pos < size:
+        match = record.match(mm, pos)
+        # Only a quoted cell left open runs to the end of the file
+        end = match.end() if match is not None else size
+        yield pos, end
+        pos = end
+
+def _content_pattern(dialect, encoding):
+    # An ASCII character other than spaces, quotes and delimiters: the record has a non-empty cell.
+    # Bytes over 0x7f may be unicode spaces, records without any other character are parsed.
+    blank = b"\\s\x1c-\x1f\x80-\xff" + re.escape(dialect.delimiter.encode(encoding))
+    if dialect.quotechar:
+        blank += re.escape(dialect.quotechar.encode(encoding))
+    return re.compile(b"[^" + blank + b"]")
+
+def _is_empty_record(data, dialect, encoding, content):
+    if content.search(data):
+        return False
+    row = next(csv.reader(io.StringIO(_decode(data, encoding)), dialect), [])
+    return not any(cell and cell.strip() for cell in row)
+
+def _build_index(version):
+    path = version[0]
+    offsets = array("q")
+    if version[2] == 0:
+        offsets.append(0)
+        return CSVRowIndex(version, [], csv.excel, offsets)
+
+    csv_format = detect_format(version)
+    if not csv_format.ascii_compatible:
+        raise ValueError(f"{csv_format.encoding} files can't be indexed, load them with load_csv_table")
+    # The BOM is left out of the byte ranges, so every record decodes on its own
+    encoding = "utf-8" if csv_format.encoding == "utf-8-sig" else csv_format.encoding
+    dialect = csv_format.dialect
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = csv_format.bom_length
+
+        # Fail early on files that can't be decoded, like a full text read would
+        decoder = codecs.getincrementaldecoder(encoding)()
+        for chunk_start in range(start, len(mm), _DECODE_CHUNK):
+            decoder.decode(mm[chunk_start:chunk_start + _DECODE_CHUNK])
+        decoder.decode(b"", final=True)
+
+        content = _content_pattern(dialect, encoding)
+
+        records = _iter_records(mm, start, dialect, encoding)
+        header_range = next(records)
+        header_data = mm[header_range[0]:header_range[1]]
+        headers = next(csv.reader(io.StringIO(_decode(header_data, encoding)), dialect), [])
+
+        for record_start, record_end in records:
+            if not _is_empty_record(mm[record_start:record_end], dialect, encoding, content):
+                offsets.append(record_start)
+        offsets.append(len(mm))
+    inc("bytes_read_total", "csv_index", version[2])
+
+    return CSVRowIndex(version, headers, dialect, offsets, encoding)
+
+_index_cache = FileCache(ROW_INDEX_MAX_BYTES, sizeof=lambda index: index.offsets.itemsize * len(index.offsets), name="csv_index")
+
+def get_row_index(path):
+    """
+    Returns the CSVRowIndex for path, rebuilding it only when the file changed.
+    """
+    return _index_cache.get(path, _build_index)
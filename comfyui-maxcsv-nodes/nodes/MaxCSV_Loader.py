@@ -4,6 +4,15 @@ import random
 from aiohttp import web
 import json
 import csv
+from .MaxCSV_Cache import load_csv_table, format_row
+from .MaxCSV_Row import ROW_TYPE, CSVRow, EMPTY_ROW
+from .MaxCSV_Index import get_row_index, can_index
+from .MaxFile_Catalog import get_catalog
+from .MaxCSV_Cursor import claim_next, mark_done, table_row_keys
+from .MaxCSV_Stream import should_stream, read_headers, count_rows, cached_count, rows_at, sample_row, stream_row_keys
+from .MaxSampling import SAMPLING_MODES, SamplingPlan, get_table_plan, batch_index_from, seeded_version_key
+from .MaxText_Utils import any as any_type
+from .MaxMetrics import span
 
 root_dir = os.path.dirname(os.path.abspath(__file__))
 csv_path = os.path.abspath(os.path.join(root_dir, "../csv"))
@@ -13,31 +22,34 @@ class Max_CSV_Loader:
     def INPUT_TYPES(cls):
         global csv_path
         try:
-            csv_files = []
-            for root, dirs, files in os.walk(csv_path):
-                for f in files:
-                    if f.lower().endswith('.csv'):
-                        full_path = os.path.join(root, f)
-                        rel_path = os.path.relpath(full_path, csv_path)
-                        csv_files.append(rel_path)
+            csv_files = get_catalog(csv_path).files('.csv')
         except Exception as e:
             csv_files = []
 
         return {
             "required": {
                 "csv_file": (csv_files,),
-                "selection_type": (["single", "multiple", "random", "iterate"], {"default": "single"}),
+                "selection_type": (["single", "multiple", "random", "iterate", "range", "resume"], {"default": "single"}),
             },
             "optional": {
                 "filter_text": ("STRING", {"default": ""}),
                 "selected_row": ("STRING", {"default": ""}),
                 "iteration_index": ("INT", {"default": 0, "min": 0, "max": 999999, "step": 1}),
+                "emit_batch": ("BOOLEAN", {"default": True}),
+                "seed": ("INT", {"default": -1, "min": -1, "max": 0xffffffffffffffff}),
+                "sampling": (SAMPLING_MODES, {"default": "uniform"}),
+                "weight_column": ("STRING", {"default": ""}),
+                "category_column": ("STRING", {"default": ""}),
+                "range_count": ("INT", {"default": 16, "min": 1, "max": 100000, "step": 1}),
+                "range_stride": ("INT", {"default": 1, "min": 1, "max": 100000, "step": 1}),
+                "cursor_name": ("STRING", {"default": "default"}),
+                "claim_timeout": ("INT", {"default": 0, "min": 0, "max": 604800, "step": 1}),
             }
         }
 
-    RETURN_TYPES = ("STRING", "OPT_FILEPATH", "STRING", "STRING", "STRING", "INT")
-    RETURN_NAMES = ("STRING", "OPT_FILEPATH", "BATCH_SELECTED", "PROMPT", "FILENAME", "TOTAL_ROWS")
-    OUTPUT_IS_LIST = (False, False, True, False, False, False)
+    RETURN_TYPES = ("STRING", "OPT_FILEPATH", "STRING", "STRING", "STRING", "INT", "INT", ROW_TYPE, "STRING")
+    RETURN_NAMES = ("STRING", "OPT_FILEPATH", "BATCH_SELECTED", "PROMPT", "FILENAME", "TOTAL_ROWS", "NEXT_INDEX", "ROW", "CLAIM")
+    OUTPUT_IS_LIST = (False, False, True, True, True, False, False, True, False)
 
     FUNCTION = "browse_csv"
 
@@ -49,10 +61,26 @@ Selection types:
 - single: Select one row at a time
 - multiple: Select multiple rows (comma-separated indices)
 - random: Randomly select one row on each prompt queue
+  With a seed (0 or more) the choice is reproducible and only changes with the seed or the file.
+  sampling: uniform, weighted (by weight_column), shuffle (consecutive seeds never repeat a row
+  until all rows were used) or stratified (consecutive seeds cycle through the values of category_column)
 - iterate: Select a single row by its index number. Increments for each item in a batch.
+- range: Select range_count rows in one run, starting at iteration_index and taking every range_stride-th row.
+  Each item in a batch continues after the previous range; NEXT_INDEX is where the next range starts.
+- resume: Claim the next row not processed yet by cursor_name, surviving restarts and shared between ComfyUI instances.
+  Rows are recorded by filename (or row number without a filename column, or for a repeated filename) in <csv file>.cursor.jsonl;
+  delete that file or change cursor_name to start over.
+  Connect CLAIM to Max CSV Cursor Done to record the row as done once the workflow finished it; with a claim_timeout
+  (seconds), rows claimed but not done by then (e.g. after a crash or a cancelled job) are claimed again.
+  Without a timeout a claimed row is never claimed again.
+PROMPT and FILENAME list one value per row of a range, otherwise the value of the first selected row
+ROW passes the same rows with every column to Max Extract Columns
+BATCH_SELECTED lists all rows in single and iterate modes, and the selected rows in the other modes; turn off emit_batch to output only the selected row
+Files over 512 MB (set MAX_NODES_STREAM_THRESHOLD_MB to change it) are read row by row instead of being loaded whole: BATCH_SELECTED then only lists the selected rows
+and weighted or stratified sampling falls back to uniform
 """
 
-    def browse_csv(self, csv_file, selection_type="single", selected_row="", filter_text="", iteration_index=0, extra_pnginfo=None):
+    def browse_csv(self, csv_file, selection_type="single", selected_row="", filter_text="", iteration_index=0, emit_batch=True, seed=-1, sampling="uniform", weight_column="", category_column="", range_count=16, range_stride=1, cursor_name="default", claim_timeout=0, extra_pnginfo=None):
         """
         Loads data from a CSV. In 'iterate' mode, it uses the extra_pnginfo 
         provided by ComfyUI to handle batch processing correctly.
@@ -60,47 +88,84 @@ Selection types:
         # Gracefully handle the case where the optional input is not connected
         if iteration_index is None:
             iteration_index = 0
+        if emit_batch is None:
+            emit_batch = True
+        if seed is None:
+            seed = -1
+        range_count = max(1, range_count or 1)
+        range_stride = max(1, range_stride or 1)
+        seeded = selection_type == "random" and seed >= 0
+        # Weighted and stratified sampling read a whole column
+        needs_columns = seeded and sampling in ("weighted", "stratified") and (weight_column or category_column)
 
         global csv_path
         csv_file = os.path.join(csv_path, csv_file)
         csv_file = os.path.abspath(csv_file)
 
         if not os.path.isfile(csv_file):
-            return ("No CSV file found", csv_file, [], "", "", 0)
+            return ("No CSV file found", csv_file, [], [""], [""], 0, iteration_index, [EMPTY_ROW], "")
 
+        # Files over the memory ceiling are never loaded whole
+        too_large = should_stream(csv_file)
+        # BATCH_SELECTED lists every row in 'single' and 'iterate' mode unless emit_batch is off
+        batch_all = emit_batch and selection_type in ("single", "iterate") and not too_large
+        # Without a filter or a full batch, only the selected row is needed: read it through the row index
+        use_index = not filter_text and not batch_all and selection_type in ("random", "iterate", "range") and not needs_columns and can_index(csv_file)
+        streaming = too_large and not use_index
+        sampled = None
         try:
-            with open(csv_file, "r", encoding="utf-8-sig") as f:
-                first_line = f.readline()
-                f.seek(0)
-                try:
-                    dialect = csv.Sniffer().sniff(first_line, delimiters=",;")
-                except Exception:
-                    dialect = csv.excel
-                reader = list(csv.reader(f, dialect))
-                if not reader or len(reader) < 2:
-                    return ("No data rows found in file", csv_file, [], "", "", 0)
-                headers = [h.strip() for h in reader[0]]
-                rows = reader[1:]
-                
-                rows = [row for row in rows if any(cell and cell.strip() for cell in row)]
+            if use_index:
+                table = None
+                index = get_row_index(csv_file)
+                raw_headers, rows = index.headers, index
+            elif streaming:
+                table = None
+                raw_headers = read_headers(csv_file)
+                if selection_type == "random" and not seeded and cached_count(csv_file, filter_text) is None:
+                    # Reservoir sampling picks the row and counts the rows in the same pass
+                    sampled = sample_row(csv_file, filter_text)
+                # Rows are read by position with rows_at, only the selected ones
+                rows = range(count_rows(csv_file, filter_text))
+            else:
+                table = load_csv_table(csv_file)
+                raw_headers, rows = table.headers, table.rows
         except Exception as e:
-             return (f"Error reading CSV: {e}", csv_file, [], "", "", 0)
+             return (f"Error reading CSV: {e}", csv_file, [], [""], [""], 0, iteration_index, [EMPTY_ROW], "")
+        if not raw_headers or (not rows and not (streaming and filter_text)):
+            return ("No data rows found in file", csv_file, [], [""], [""], 0, iteration_index, [EMPTY_ROW], "")
+        headers = table.field_names if table else [h.strip() for h in raw_headers]
 
-        if filter_text:
-            rows = [row for row in rows if any(filter_text.lower() in str(cell).lower() for cell in row)]
+        # Positions in the file of the rows that can be selected (positions among the matching rows when streaming)
+        if streaming:
+            row_ids = rows
+        else:
+            row_ids = table.search(filter_text) if filter_text else range(len(rows))
         
-        total_rows = len(rows)
+        total_rows = len(row_ids)
 
-        if not rows:
-            return ("No matching rows found", csv_file, [], "", "", total_rows)
+        if not row_ids:
+            return ("No matching rows found", csv_file, [], [""], [""], total_rows, iteration_index, [EMPTY_ROW], "")
 
+        next_index = iteration_index
         selected_indices = []
+        # Row claimed in resume mode, for Max CSV Cursor Done
+        claim_output = ""
         if selection_type == "random":
-            selected_indices = [random.randint(0, len(rows)-1)]
+            if seeded:
+                if table is not None:
+                    plan = get_table_plan(table, row_ids, filter_text, weight_column, category_column)
+                else:
+                    plan = SamplingPlan(len(row_ids))
+                # Each prompt of a queued batch draws with the next seed
+                selected_indices = [plan.draw(sampling, seed + batch_index_from(extra_pnginfo))]
+            elif sampled is not None:
+                selected_indices = [sampled[0]]
+            else:
+                selected_indices = [random.randint(0, len(row_ids)-1)]
         elif selection_type == "multiple":
             if selected_row:
                 try:
-                    selected_indices = [int(idx) for idx in selected_row.split(",") if idx.strip().isdigit() and int(idx) < len(rows)]
+                    selected_indices = [int(idx) for idx in selected_row.split(",") if idx.strip().isdigit() and int(idx) < len(row_ids)]
                 except Exception:
                     selected_indices = []
         elif selection_type == "iterate":
@@ -115,10 +180,33 @@ Selection types:
                 current_iteration_index += batch_index
             
             # Use modulo to wrap around if the index exceeds the number of rows
-            safe_index = current_iteration_index % len(rows)
+            safe_index = current_iteration_index % len(row_ids)
             selected_indices = [safe_index]
+            next_index = current_iteration_index + 1
+        elif selection_type == "range":
+            # Each item in a batch continues where the previous range stopped
+            start = iteration_index + batch_index_from(extra_pnginfo) * range_count * range_stride
+            next_index = start + range_count * range_stride
+            selected_indices = list(range(start, min(next_index, len(row_ids)), range_stride))
+            if not selected_indices:
+                return ("No rows left in range", csv_file, [], [""], [""], total_rows, next_index, [EMPTY_ROW], "")
+        elif selection_type == "resume":
+            cursor_name = cursor_name or "default"
+            try:
+                if streaming:
+                    keys = stream_row_keys(csv_file, filter_text)
+                else:
+                    keys = table_row_keys(table, row_ids, filter_text)
+                position = claim_next(csv_file, cursor_name, keys, claim_timeout or 0)
+            except OSError as e:
+                return (f"Error updating cursor: {e}", csv_file, [], [""], [""], total_rows, iteration_index, [EMPTY_ROW], "")
+            if position is None:
+                return ("All rows processed or claimed", csv_file, [], [""], [""], total_rows, total_rows, [EMPTY_ROW], "")
+            selected_indices = [position]
+            next_index = position + 1
+            claim_output = json.dumps({"csv_file": os.path.relpath(csv_file, csv_path), "cursor": cursor_name, "key": keys.keys[position]})
         else:  # single
-            if not selected_row or not selected_row.isdigit() or int(selected_row) >= len(rows):
+            if not selected_row or not selected_row.isdigit() or int(selected_row) >= len(row_ids):
                 selected_indices = [0]
             else:
                 selected_indices = [int(selected_row)]
@@ -126,106 +214,113 @@ Selection types:
         if not selected_indices:
              selected_indices = [0]
 
-        outputs = []
-        for idx in selected_indices:
-            row = rows[idx]
-            out = ""
-            for i, h in enumerate(headers):
-                v = row[i] if i < len(row) else ""
-                out += f"{h}:\n\n{v}\n\n"
-            outputs.append(out.strip())
-        output_str = "\n---\n".join(outputs)
-
-        filename_output = ""
-        try:
-            lower_headers = [h.lower() for h in headers]
-            if 'filename' in lower_headers:
-                filename_col_idx = lower_headers.index('filename')
-                first_selected_idx = selected_indices[0]
-                first_row = rows[first_selected_idx]
-                if filename_col_idx < len(first_row):
-                    filename_output = first_row[filename_col_idx]
-        except Exception as e:
-            print(f"MaxCSV_Loader: Could not extract filename. Error: {e}")
-            filename_output = ""
+        selected_ids = [row_ids[idx] for idx in selected_indices]
+        # Rows read through the row index are parsed once
+        if sampled is not None:
+            selected_rows = {sampled[0]: sampled[1]}
+        elif streaming:
+            selected_rows = rows_at(csv_file, selected_ids, filter_text)
+        else:
+            selected_rows = {row_id: rows[row_id] for row_id in selected_ids}
 
-        prompt_output = ""
-        try:
-            lower_headers = [h.lower() for h in headers]
-            if 'prompt' in lower_headers:
-                prompt_col_idx = lower_headers.index('prompt')
-                first_selected_idx = selected_indices[0]
-                first_row = rows[first_selected_idx]
-                if prompt_col_idx < len(first_row):
-                    prompt_output = first_row[prompt_col_idx]
-        except Exception as e:
-            print(f"MaxCSV_Loader: Could not extract prompt. Error: {e}")
-            prompt_output = ""
+        def format_output(row_id):
+            if table is not None:
+                return table.format_row(row_id)
+            return format_row(headers, selected_rows[row_id])
 
-        if selection_type == "iterate" or selection_type == "single":
-            all_indices = list(range(len(rows)))
-        elif selection_type == "multiple":
-            all_indices = selected_indices if selected_indices else []
-        else: # random
-            all_indices = selected_indices
+        output_str = "\n---\n".join(format_output(row_id) for row_id in selected_ids)
+
+        # PROMPT and FILENAME list every row of a range, otherwise the first selected row
+        output_ids = selected_ids if selection_type == "range" else selected_ids[:1]
+        lower_headers = [h.lower() for h in headers]
+
+        def column_output(name):
+            if name not in lower_headers:
+                return ["" for _ in output_ids]
+            col_idx = lower_headers.index(name)
+            return [selected_rows[row_id][col_idx] if col_idx < len(selected_rows[row_id]) else "" for row_id in output_ids]
 
-        all_outputs = []
-        for idx in all_indices:
-            row = rows[idx]
-            out = ""
-            for i, h in enumerate(headers):
-                v = row[i] if i < len(row) else ""
-                out += f"{h}:\n\n{v}\n\n"
-            all_outputs.append(out.strip())
+        filename_output = column_output('filename')
+        prompt_output = column_output('prompt')
+        row_output = [CSVRow(headers, selected_rows[row_id]) for row_id in output_ids]
 
-        return (output_str, csv_file, all_outputs, prompt_output, filename_output, total_rows)
+        batch_ids = row_ids if batch_all else selected_ids
+        with span("csv_format_rows"):
+            all_outputs = [format_output(row_id) for row_id in batch_ids]
+
+        return (output_str, csv_file, all_outputs, prompt_output, filename_output, total_rows, next_index, row_output, claim_output)
 
     @classmethod
-    def IS_CHANGED(cls, selection_type, csv_file, selected_row="", filter_text="", iteration_index=0):
-        # For 'random' and 'iterate', we want the node to execute for every run in a batch.
+    def IS_CHANGED(cls, selection_type, csv_file, selected_row="", filter_text="", iteration_index=0, emit_batch=True, seed=-1, sampling="uniform", weight_column="", category_column="", range_count=16, range_stride=1, cursor_name="default", claim_timeout=0):
+        # A seeded random selection only changes with the file and the sampling inputs
+        if selection_type == "random" and seed is not None and seed >= 0:
+            version = seeded_version_key(os.path.join(csv_path, csv_file), seed)
+            return f"{version}:{sampling}:{weight_column}:{category_column}:{filter_text}:{emit_batch}"
+        # For 'random', 'iterate', 'range' and 'resume', we want the node to execute for every run in a batch.
         # Returning float('nan') tells ComfyUI that the output is always different.
-        if selection_type == "random" or selection_type == "iterate":
+        if selection_type in ("random", "iterate", "range", "resume"):
             return float('nan')
             
         if iteration_index is None:
             iteration_index = 0
-        return f"{csv_file}:{selection_type}:{selected_row}:{filter_text}:{iteration_index}"
+        return f"{csv_file}:{selection_type}:{selected_row}:{filter_text}:{iteration_index}:{emit_batch}"
 
     # The VALIDATE_INPUTS function has been removed to prevent the pre-execution crash.
     # The node's main browse_csv function will handle file existence checks.
 
-def get_directory_structure(path):
-    structure = {"name": os.path.basename(path), "children": [], "path": path, "expanded": False}
-    try:
-        with os.scandir(path) as entries:
-            for entry in entries:
-                if entry.is_dir():
-                    structure["children"].append(get_directory_structure(entry.path))
-    except PermissionError:
-        pass
-    return structure
+class Max_CSV_Cursor_Done:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "claim": ("STRING", {"default": "", "forceInput": True}),
+            },
+            "optional": {
+                "after": (any_type,),
+            }
+        }
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("STRING",)
+    FUNCTION = "mark_done"
+    OUTPUT_NODE = True
+    CATEGORY = "Max NODES"
+    DESCRIPTION = """
+Records the row claimed by a Max CSV Loader in resume mode as done, so it's never claimed again
+claim: the CLAIM output of the loader
+after: connect the last output of the workflow (e.g. the saved image) so the row is only done once it ran
+"""
+
+    def mark_done(self, claim, after=None):
+        try:
+            claim = json.loads(claim)
+            csv_file = os.path.abspath(os.path.join(csv_path, claim["csv_file"]))
+            cursor, key = claim["cursor"], claim["key"]
+        except (ValueError, KeyError, TypeError):
+            return ("No claim to record",)
+        # Only the cursor files of the CSV folder are written
+        if os.path.commonpath([csv_file, csv_path]) != csv_path or not os.path.isfile(csv_file):
+            return ("No CSV file found",)
+        try:
+            mark_done(csv_file, cursor, key)
+        except OSError as e:
+            return (f"Error updating cursor: {e}",)
+        return (f"{key} done",)
+
+    @classmethod
+    def IS_CHANGED(cls, claim, after=None):
+        return float('nan')
 
 def get_rows_from_csv(file_path, filter_text=""):
     try:
-        with open(file_path, "r", encoding="utf-8-sig") as f:
-            first_line = f.readline()
-            f.seek(0)
-            try:
-                dialect = csv.Sniffer().sniff(first_line, delimiters=",;")
-            except Exception:
-                dialect = csv.excel
-            reader = list(csv.reader(f, dialect))
-            if not reader or len(reader) < 2:
-                return {"headers": [], "rows": []}
-            headers = reader[0]
-            rows = reader[1:]
-            
-            rows = [row for row in rows if any(cell and cell.strip() for cell in row)]
-            
-            if filter_text:
-                rows = [row for row in rows if any(filter_text.lower() in str(cell).lower() for cell in row)]
-            return {"headers": headers, "rows": rows}
+        table = load_csv_table(file_path)
     except Exception as e:
         print(f"Error reading CSV file {file_path}: {e}")
         return {"headers": [], "rows": []}
-
+    if not table.headers or not table.rows:
+        return {"headers": [], "rows": []}
+    if filter_text:
+        rows = [list(table.rows[i]) for i in table.search(filter_text)]
+    else:
+        rows = [list(row) for row in table.rows]
+    return {"headers": table.headers, "rows": rows}
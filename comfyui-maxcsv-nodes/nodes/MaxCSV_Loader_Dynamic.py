@@ -4,6 +4,14 @@ import random
 from aiohttp import web
 import json
 import csv
+import bisect
+from .MaxCSV_Cache import load_csv_table
+from .MaxCSV_Row import ROW_TYPE, CSVRow, EMPTY_ROW
+from .MaxServer_Utils import run_blocking
+from .MaxFile_Catalog import get_catalog
+from .MaxCSV_Stream import should_stream, read_headers, count_rows, cached_count, rows_at, sample_row, read_window, STREAM_WINDOW_MAX_ROWS
+from .MaxSampling import SAMPLING_MODES, SamplingPlan, get_table_plan, batch_index_from, seeded_version_key
+from .MaxMetrics import span
 
 root_dir = os.path.dirname(os.path.abspath(__file__))
 csv_path = os.path.abspath(os.path.join(root_dir, "../csv"))
@@ -16,64 +24,96 @@ class Max_CSV_Loader_Dynamic:
     def INPUT_TYPES(cls):
         global csv_path
         try:
-            csv_files = []
-            for root, dirs, files in os.walk(csv_path):
-                for f in files:
-                    if f.lower().endswith('.csv'):
-                        full_path = os.path.join(root, f)
-                        rel_path = os.path.relpath(full_path, csv_path)
-                        csv_files.append(rel_path)
+            csv_files = get_catalog(csv_path).files('.csv')
         except Exception as e:
             csv_files = []
 
         return {
             "required": {
                 "csv_file": (csv_files,),
-                "selection_type": (["single", "multiple", "random", "iterate"], {"default": "single"}),
+                "selection_type": (["single", "multiple", "random", "iterate", "range"], {"default": "single"}),
             },
             "optional": {
                 "filter_text": ("STRING", {"default": ""}),
                 "selected_row": ("STRING", {"default": ""}),
                 "iteration_index": ("INT", {"default": 0, "min": 0, "max": 999999, "step": 1}),
+                "seed": ("INT", {"default": -1, "min": -1, "max": 0xffffffffffffffff}),
+                "sampling": (SAMPLING_MODES, {"default": "uniform"}),
+                "weight_column": ("STRING", {"default": ""}),
+                "category_column": ("STRING", {"default": ""}),
+                "range_count": ("INT", {"default": 16, "min": 1, "max": 100000, "step": 1}),
+                "range_stride": ("INT", {"default": 1, "min": 1, "max": 100000, "step": 1}),
             }
         }
 
-    RETURN_TYPES = ("STRING", "STRING", "STRING", "STRING", "STRING", "STRING", "STRING", "STRING", "INT", "STRING")
-    RETURN_NAMES = ("output_1", "output_2", "output_3", "output_4", "output_5", "output_6", "output_7", "output_8", "TOTAL_ROWS", "PROMPT")
+    RETURN_TYPES = ("STRING", "STRING", "STRING", "STRING", "STRING", "STRING", "STRING", "STRING", "INT", "STRING", "INT", ROW_TYPE)
+    RETURN_NAMES = ("output_1", "output_2", "output_3", "output_4", "output_5", "output_6", "output_7", "output_8", "TOTAL_ROWS", "PROMPT", "NEXT_INDEX", "ROW")
+    OUTPUT_IS_LIST = (True, True, True, True, True, True, True, True, False, True, False, True)
     FUNCTION = "browse_csv"
     CATEGORY = "Max NODES"
-    DESCRIPTION = "Loads rows from a CSV file with dynamic outputs."
+    DESCRIPTION = "Loads rows from a CSV file with dynamic outputs. A seed of 0 or more makes random selection reproducible (see Max_CSV_Loader for the sampling modes). In range mode every column output lists one value per row of the range. ROW passes the same rows with every column to Max Extract Columns. Files over 512 MB (set MAX_NODES_STREAM_THRESHOLD_MB to change it) are read row by row instead of being loaded whole."
 
-    def browse_csv(self, csv_file, selection_type="single", selected_row="", filter_text="", iteration_index=0, extra_pnginfo=None):
+    def browse_csv(self, csv_file, selection_type="single", selected_row="", filter_text="", iteration_index=0, seed=-1, sampling="uniform", weight_column="", category_column="", range_count=16, range_stride=1, extra_pnginfo=None):
         if iteration_index is None:
             iteration_index = 0
+        if seed is None:
+            seed = -1
+        range_count = max(1, range_count or 1)
+        range_stride = max(1, range_stride or 1)
+        empty = ([""], [""], [""], [""], [""], [""], [""], [""])
 
         global csv_path
         csv_file_path = os.path.join(csv_path, csv_file)
         csv_file_path = os.path.abspath(csv_file_path)
 
         if not os.path.isfile(csv_file_path):
-            return ("", "", "", "", "", "", "", "", 0, "")
+            return empty + (0, [""], iteration_index, [EMPTY_ROW])
 
+        # Files over the memory ceiling are never loaded whole
+        streaming = should_stream(csv_file_path)
+        sampled = None
         try:
-            with open(csv_file_path, "r", encoding="utf-8-sig") as f:
-                reader = csv.reader(f)
-                headers = [h.strip() for h in next(reader)]
-                rows = list(reader)
+            if streaming:
+                table = None
+                headers = [h.strip() for h in read_headers(csv_file_path)]
+                if selection_type == "random" and seed < 0 and cached_count(csv_file_path, filter_text) is None:
+                    # Reservoir sampling picks the row and counts the rows in the same pass
+                    sampled = sample_row(csv_file_path, filter_text)
+                # Rows are read by position with rows_at, only the selected ones
+                rows = row_ids = range(count_rows(csv_file_path, filter_text))
+            else:
+                table = load_csv_table(csv_file_path)
+                headers = table.field_names
         except Exception as e:
-            return ("", "", "", "", "", "", "", "", 0, "")
+            return empty + (0, [""], iteration_index, [EMPTY_ROW])
+        if not headers:
+            return empty + (0, [""], iteration_index, [EMPTY_ROW])
 
-        if filter_text:
-            rows = [row for row in rows if any(filter_text.lower() in str(cell).lower() for cell in row)]
+        if not streaming:
+            rows = table.rows
+            # Positions in the file of the rows that can be selected
+            row_ids = table.search(filter_text) if filter_text else range(len(rows))
+            if filter_text:
+                rows = [rows[i] for i in row_ids]
 
         total_rows = len(rows)
 
         if not rows:
-            return ("", "", "", "", "", "", "", "", total_rows, "")
+            return empty + (total_rows, [""], iteration_index, [EMPTY_ROW])
 
+        next_index = iteration_index
         selected_indices = []
         if selection_type == "random":
-            selected_indices = [random.randint(0, len(rows) - 1)]
+            if seed >= 0:
+                if table is not None:
+                    plan = get_table_plan(table, row_ids, filter_text, weight_column, category_column)
+                else:
+                    plan = SamplingPlan(len(row_ids))
+                selected_indices = [plan.draw(sampling, seed + batch_index_from(extra_pnginfo))]
+            elif sampled is not None:
+                selected_indices = [sampled[0]]
+            else:
+                selected_indices = [random.randint(0, len(rows) - 1)]
         elif selection_type == "multiple":
             if selected_row:
                 try:
@@ -87,6 +127,13 @@ class Max_CSV_Loader_Dynamic:
                 current_iteration_index += batch_index
             safe_index = current_iteration_index % len(rows)
             selected_indices = [safe_index]
+            next_index = current_iteration_index + 1
+        elif selection_type == "range":
+            start = iteration_index + batch_index_from(extra_pnginfo) * range_count * range_stride
+            next_index = start + range_count * range_stride
+            selected_indices = list(range(start, min(next_index, len(rows)), range_stride))
+            if not selected_indices:
+                return empty + (total_rows, [""], next_index, [EMPTY_ROW])
         else:  # single
             if not selected_row or not selected_row.isdigit() or int(selected_row) >= len(rows):
                 selected_indices = [0]
@@ -96,31 +143,35 @@ class Max_CSV_Loader_Dynamic:
         if not selected_indices:
             selected_indices = [0]
 
-        # Get the first selected row
-        first_row = rows[selected_indices[0]]
+        if sampled is not None:
+            rows = {sampled[0]: sampled[1]}
+        elif streaming:
+            rows = rows_at(csv_file_path, selected_indices, filter_text)
 
-        # Create the output tuple
-        outputs = [first_row[i] if i < len(first_row) else "" for i in range(8)]
+        # Column outputs list every row of a range, otherwise the first selected row
+        output_rows = [rows[idx] for idx in (selected_indices if selection_type == "range" else selected_indices[:1])]
+        outputs = [[row[i] if i < len(row) else "" for row in output_rows] for i in range(8)]
 
         # Get the prompt output
-        prompt_output = ""
-        try:
-            lower_headers = [h.lower() for h in headers]
-            if 'prompt' in lower_headers:
-                prompt_col_idx = lower_headers.index('prompt')
-                if prompt_col_idx < len(first_row):
-                    prompt_output = first_row[prompt_col_idx]
-        except Exception as e:
-            prompt_output = ""
+        lower_headers = [h.lower() for h in headers]
+        prompt_output = ["" for _ in output_rows]
+        if 'prompt' in lower_headers:
+            prompt_col_idx = lower_headers.index('prompt')
+            prompt_output = [row[prompt_col_idx] if prompt_col_idx < len(row) else "" for row in output_rows]
 
         # Create the return names tuple
         return_names = [f"{headers[i]}" if i < len(headers) else "" for i in range(8)]
 
-        return {"ui": {"string_table": [headers] + rows, "selected_row": selected_row}, "result": tuple(outputs + [total_rows, prompt_output])}
+        # Only the selected rows are sent to the UI, the browser pages through /max_csv_browser/get_rows
+        selected_rows = [list(rows[idx]) for idx in selected_indices]
+        return {"ui": {"string_table": [headers] + selected_rows, "selected_row": selected_row, "total_rows": [total_rows]}, "result": tuple(outputs + [total_rows, prompt_output, next_index, [CSVRow(headers, row) for row in output_rows]])}
 
     @classmethod
-    def IS_CHANGED(cls, selection_type, csv_file, selected_row="", filter_text="", iteration_index=0):
-        if selection_type == "random" or selection_type == "iterate":
+    def IS_CHANGED(cls, selection_type, csv_file, selected_row="", filter_text="", iteration_index=0, seed=-1, sampling="uniform", weight_column="", category_column="", range_count=16, range_stride=1):
+        if selection_type == "random" and seed is not None and seed >= 0:
+            version = seeded_version_key(os.path.join(csv_path, csv_file), seed)
+            return f"{version}:{sampling}:{weight_column}:{category_column}:{filter_text}"
+        if selection_type in ("random", "iterate", "range"):
             return float('nan')
         return f"{csv_file}:{selection_type}:{selected_row}:{filter_text}:{iteration_index}"
 
@@ -142,6 +193,11 @@ async def get_file_info(request):
 
 @PromptServer.instance.routes.get("/max_csv_browser/get_rows")
 async def get_rows(request):
+    """
+    Returns the rows of a CSV file. Optional query parameters select a window of the rows:
+    offset, limit, filter (same syntax as filter_text), sort (column name or index) and order (asc/desc).
+    "ids" holds the position of each returned row among the filtered rows, as used by selected_row.
+    """
     csv_file = request.query.get("csv_file", "")
     if not csv_file:
         return web.json_response({"error": "csv_file not specified"}, status=400)
@@ -154,10 +210,89 @@ async def get_rows(request):
         return web.json_response({"error": "File not found"}, status=404)
 
     try:
-        with open(csv_file_path, "r", encoding="utf-8-sig") as f:
-            reader = csv.reader(f)
-            headers = [h.strip() for h in next(reader)]
-            rows = list(reader)
-            return web.json_response({"headers": headers, "rows": rows})
+        offset = max(0, int(request.query.get("offset", 0)))
+        limit = request.query.get("limit")
+        limit = max(0, int(limit)) if limit not in (None, "") else None
+    except ValueError:
+        return web.json_response({"error": "offset and limit must be integers"}, status=400)
+    filter_text = request.query.get("filter", "")
+    sort = request.query.get("sort", "")
+    descending = request.query.get("order", "asc").lower() == "desc"
+
+    if should_stream(csv_file_path):
+        # Files over the memory ceiling are read one window at a time
+        if sort:
+            return web.json_response({"error": "Sorting is not available for files this large"}, status=400)
+        limit = STREAM_WINDOW_MAX_ROWS if limit is None else min(limit, STREAM_WINDOW_MAX_ROWS)
+
+    try:
+        args = (csv_file_path, offset, limit, filter_text, sort, descending)
+        body = await run_blocking("get_rows", _rows_json, *args, key=args)
+        if body is None:
+            return web.json_response({"error": "Invalid sort column"}, status=400)
+        return web.Response(text=body, content_type="application/json")
     except Exception as e:
         return web.json_response({"error": str(e)}, status=500)
+
+def _sorted_matches(sorted_ids, ids):
+    matching = set(ids)
+    return [i for i in sorted_ids if i in matching]
+
+def _rows_json(csv_file_path, offset=0, limit=None, filter_text="", sort="", descending=False):
+    """
+    Returns the JSON body of the rows route, or None when sort is a column index past the last column.
+    """
+    if should_stream(csv_file_path):
+        window, total = read_window(csv_file_path, offset, limit, filter_text)
+        return json.dumps({
+            "headers": [h.strip() for h in read_headers(csv_file_path)],
+            "rows": window,
+            "ids": list(range(offset, offset + len(window))),
+            "total": total,
+            "offset": offset,
+        })
+
+    table = load_csv_table(csv_file_path)
+    ids = table.search(filter_text) if filter_text else range(len(table.rows))
+
+    sort_column = None
+    if sort:
+        lower_headers = [h.lower() for h in table.field_names]
+        if sort.lower() in lower_headers:
+            sort_column = lower_headers.index(sort.lower())
+        elif sort.isdigit():
+            sort_column = int(sort)
+            if sort_column >= len(table.field_names):
+                # Reported as a bad request by the route
+                return None
+
+    if sort_column is None:
+        order = ids
+    else:
+        order = table.sorted_ids(sort_column)
+        if filter_text:
+            # Matching rows in sort order, built once per filter and column rather than per page
+            sorted_ids = order
+            order = table.filtered(("sorted_matches", filter_text, sort_column), lambda table: _sorted_matches(sorted_ids, ids))
+
+    if descending and sort_column is not None:
+        # Pages of the reversed order, sliced from the end of the ascending one
+        stop = max(len(order) - offset, 0)
+        start = 0 if limit is None else max(stop - limit, 0)
+        window = order[start:stop][::-1]
+    else:
+        end = len(order) if limit is None else offset + limit
+        window = order[offset:end]
+    if sort_column is None:
+        positions = list(range(offset, offset + len(window)))
+    else:
+        positions = [bisect.bisect_left(ids, i) for i in window]
+
+    with span("rows_json"):
+        return json.dumps({
+            "headers": table.field_names,
+            "rows": [list(table.rows[i]) for i in window],
+            "ids": positions,
+            "total": len(ids),
+            "offset": offset,
+        })
@@ -0,0 +1,141 @@
+import os
+from .MaxCSV_Cache import load_csv_table, file_version, format_row
+from .MaxCSV_Row import ROW_TYPE, CSVRow, EMPTY_ROW
+from .MaxCSV_Stream import should_stream
+from .MaxFile_Catalog import get_catalog
+from .MaxMetrics import span
+
+root_dir = os.path.dirname(os.path.abspath(__file__))
+csv_path = os.path.abspath(os.path.join(root_dir, "../csv"))
+
+# How keys are compared, surrounding spaces are always ignored
+MATCH_MODES = ["exact", "case-insensitive"]
+# Rows output per key: the first matching row, or every one of them
+RESULT_MODES = ["first", "all"]
+
+_NORMALIZE = {
+    "exact": str.strip,
+    "case-insensitive": lambda value: value.strip().casefold(),
+}
+
+def _build_key_index(values, normalize):
+    # key -> row id, or list of row ids for keys found on several rows; empty keys are left out
+    index = {}
+    for i, value in enumerate(values):
+        key = normalize(value)
+        if not key:
+            continue
+        ids = index.get(key)
+        if ids is None:
+            index[key] = i
+        elif isinstance(ids, list):
+            ids.append(i)
+        else:
+            index[key] = [ids, i]
+    return index
+
+def key_index(table, column, match="exact"):
+    """
+    Returns {key: row id or list of row ids} for one column of a CSVTable, built once per table version.
+    """
+    normalize = _NORMALIZE[match]
+    # Read outside derived(): column() memoizes through it as well
+    values = table.column(column)
+    return table.derived(("key_index", column, match), lambda table: _build_key_index(values, normalize))
+
+def lookup_rows(table, column, key, match="exact"):
+    """
+    Returns the ids of the rows of table whose column equals key (see MATCH_MODES), in file order.
+    """
+    key = _NORMALIZE[match](key or "")
+    if not key:
+        return []
+    ids = key_index(table, column, match).get(key)
+    if ids is None:
+        return []
+    return ids if isinstance(ids, list) else [ids]
+
+class Max_CSV_Lookup:
+    @classmethod
+    def INPUT_TYPES(cls):
+        global csv_path
+        try:
+            csv_files = get_catalog(csv_path).files('.csv')
+        except Exception as e:
+            csv_files = []
+
+        return {
+            "required": {
+                "csv_file": (csv_files,),
+                "key_column": ("STRING", {"default": "name"}),
+                "match": (MATCH_MODES, {"default": "exact"}),
+                "results": (RESULT_MODES, {"default": "first"}),
+            },
+            "optional": {
+                "row": (ROW_TYPE,),
+                "row_column": ("STRING", {"default": ""}),
+                "key": ("STRING", {"default": ""}),
+                "prefix": ("STRING", {"default": ""}),
+            }
+        }
+
+    RETURN_TYPES = (ROW_TYPE, "STRING", "INT")
+    RETURN_NAMES = ("ROW", "STRING", "MATCHES")
+    OUTPUT_IS_LIST = (True, True, False)
+    FUNCTION = "lookup"
+    CATEGORY = "Max NODES"
+    DESCRIPTION = """
+Looks up a key in the key_column of another CSV file and merges the matching row into the input row
+The key is the row_column value of the connected ROW (key_column when row_column is empty), or the key text without a ROW
+match: exact, or case-insensitive (surrounding spaces are ignored in both)
+results: first matching row, or all of them (one output row each)
+
+ROW and STRING (same layout as the CSV loader text) hold the columns of the input row followed by those of the found row;
+prefix is added to the names of the found columns, set it to keep both values of columns present in both files
+Without a match the found columns are empty and MATCHES is 0
+Keys are looked up in an index built once per file version; a list of rows (e.g. a ROW output of a loader) is looked up row by row
+Files over 512 MB (MAX_NODES_STREAM_THRESHOLD_MB) are not indexed
+"""
+
+    def lookup(self, csv_file, key_column, match="exact", results="first", row=None, row_column="", key="", prefix=""):
+        if row is None:
+            row = EMPTY_ROW
+        else:
+            key = row.get((row_column or key_column).strip(), "")
+        prefix = prefix or ""
+
+        global csv_path
+        csv_file = os.path.abspath(os.path.join(csv_path, csv_file))
+        if not os.path.isfile(csv_file):
+            return ([row], ["No CSV file found"], 0)
+        if should_stream(csv_file):
+            return ([row], ["CSV file too large for lookups"], 0)
+        try:
+            table = load_csv_table(csv_file)
+        except Exception as e:
+            return ([row], [f"Error reading CSV: {e}"], 0)
+
+        lowered = [h.lower() for h in table.field_names]
+        column = key_column.strip().lower()
+        if column not in lowered:
+            return ([row], [f"Column '{key_column.strip()}' not found in {os.path.basename(csv_file)}"], 0)
+
+        with span("csv_lookup"):
+            row_ids = lookup_rows(table, lowered.index(column), key, match)
+        if results == "first":
+            row_ids = row_ids[:1]
+
+        headers = list(row) + [prefix + h for h in table.field_names]
+        cells = list(row.values())
+        width = len(table.field_names)
+        found = [list(table.rows[i]) for i in row_ids] or [[]]
+        merged = [cells + values + [""] * (width - len(values)) for values in found]
+        return ([CSVRow(headers, values) for values in merged], [format_row(headers, values) for values in merged], len(row_ids))
+
+    @classmethod
+    def IS_CHANGED(cls, csv_file, key_column, match="exact", results="first", row=None, row_column="", key="", prefix=""):
+        # Looks up again when the file changes
+        try:
+            return str(file_version(os.path.join(csv_path, csv_file)))
+        except OSError:
+            return float('nan')
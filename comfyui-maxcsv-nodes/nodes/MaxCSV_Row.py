@@ -0,0 +1,68 @@
+import re
+from collections.abc import Mapping
+from functools import lru_cache
+
+# Node type of the ROW outputs of the CSV loaders
+ROW_TYPE = "MAX_ROW"
+# Loader texts ("header:\n\nvalue" blocks) kept parsed
+ROW_TEXT_CACHE_SIZE = 1024
+
+# A header line of the loader text layout: preceded and followed by an empty line, or starting the next row
+_HEADER_RE = re.compile(r'(?:\A|\n\n|(\n---\n))([^\n]*):(?:\n\n|\Z|(?=\n---\n))')
+
+@lru_cache(maxsize=64)
+def _column_map(headers):
+    # (names, {lowercase name: column index}), duplicate names keep their first column
+    names, columns = [], {}
+    for j, header in enumerate(headers):
+        key = header.strip().lower()
+        if key not in columns:
+            columns[key] = j
+            names.append(header.strip())
+    return tuple(names), columns
+
+class CSVRow(Mapping):
+    """
+    One CSV row as passed between nodes (MAX_ROW): a read-only mapping of header -> cell.
+    Lookups ignore case and surrounding spaces and take a single dict access;
+    the header map is built once per header list and shared by every row.
+    """
+    __slots__ = ("_names", "_columns", "_cells")
+
+    def __init__(self, headers, cells):
+        self._names, self._columns = _column_map(tuple(headers))
+        self._cells = cells
+
+    def __getitem__(self, name):
+        j = self._columns[name.strip().lower()]
+        return self._cells[j] if j < len(self._cells) else ""
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __repr__(self):
+        return f"CSVRow({dict(self)!r})"
+
+EMPTY_ROW = CSVRow((), [])
+
+@lru_cache(maxsize=ROW_TEXT_CACHE_SIZE)
+def parse_row_text(text):
+    """
+    Returns the CSVRow of a CSV loader text ("header:\\n\\nvalue" blocks, see MaxCSV_Cache.format_row).
+    With several rows ("---" separated) the values of the first row are kept.
+    """
+    text = text or ""
+    matches = []
+    stop = len(text)
+    for match in _HEADER_RE.finditer(text):
+        if match.group(1):
+            stop = match.start()
+            break
+        matches.append(match)
+    headers = [match.group(2) for match in matches]
+    ends = [match.start() for match in matches[1:]] + [stop]
+    cells = [text[match.end():end] for match, end in zip(matches, ends)]
+    return CSVRow(headers, cells)
@@ -0,0 +1,167 @@
+import os
+import csv
+import json
+import mmap
+import tempfile
+from array import array
+from itertools import accumulate
+
+# CSV files smaller than this are parsed directly, a snapshot wouldn't pay off
+SNAPSHOT_MIN_BYTES = 4 * 1024 * 1024
+# First bytes of a snapshot file, changed whenever the layout or the way files are parsed changes
+SNAPSHOT_MAGIC = b"MAXCSVSNAP2\n"
+
+_SEPARATOR = "\x00"
+_DIALECT_ATTRIBUTES = ("delimiter", "quotechar", "escapechar", "doublequote", "skipinitialspace", "lineterminator", "quoting")
+
+def snapshot_path(csv_file):
+    directory, name = os.path.split(csv_file)
+    return os.path.join(directory, f".{name}.snapshot")
+
+def _align(pos):
+    return (pos + 7) & ~7
+
+class SnapshotRows:
+    """
+    Rows of a CSV snapshot, read from the memory-mapped file on demand.
+    Supports len(), indexing and iteration like a list of rows.
+    Every column is stored as its cells joined by NUL, plus the byte offset of each cell,
+    so a single cell is one slice of the map and a whole column is one decode and split.
+    """
+    def __init__(self, mm, header):
+        self._mm = mm
+        self._view = memoryview(mm)
+        self._length = header["rows"]
+        self._columns = header["columns"]
+        self._offsets = [self._view[pos:pos + 8 * (self._length + 1)].cast("q") for pos, _, _ in self._columns]
+        lengths = header["lengths"]
+        self._lengths = None if lengths is None else self._view[lengths:lengths + 4 * self._length].cast("i")
+        self._decoded = {}
+
+    def __len__(self):
+        return self._length
+
+    def _row_length(self, i):
+        return len(self._columns) if self._lengths is None else self._lengths[i]
+
+    def cell(self, i, j):
+        column = self._decoded.get(j)
+        if column is not None:
+            return column[i]
+        offsets = self._offsets[j]
+        blob = self._columns[j][1]
+        return bytes(self._view[blob + offsets[i]:blob + offsets[i + 1] - 1]).decode("utf-8")
+
+    def column(self, j):
+        # All cells of column j as a list ("" where a row is shorter)
+        column = self._decoded.get(j)
+        if column is None:
+            _, blob, size = self._columns[j]
+            column = self._decoded[j] = bytes(self._view[blob:blob + size]).decode("utf-8").split(_SEPARATOR)
+        return column
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(self._length))]
+        if i < 0:
+            i += self._length
+        if i < 0 or i >= self._length:
+            raise IndexError("row index out of range")
+        return [self.cell(i, j) for j in range(self._row_length(i))]
+
+    def __iter__(self):
+        columns = [self.column(j) for j in range(len(self._columns))]
+        if self._lengths is None:
+            return map(list, zip(*columns))
+        return (list(row[:n]) for row, n in zip(zip(*columns), self._lengths))
+
+def _snapshot_dialect(values):
+    class SnapshotDialect(csv.Dialect):
+        pass
+    for name in _DIALECT_ATTRIBUTES:
+        setattr(SnapshotDialect, name, values[name])
+    return SnapshotDialect
+
+def load_snapshot(version):
+    """
+    Returns (headers, rows, dialect) from the snapshot of a CSV file version,
+    or None when there is no snapshot matching this version of the file.
+    """
+    try:
+        with open(snapshot_path(version[0]), "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            header = json.loads(f.readline().decode("utf-8"))
+            if header["source"] != [version[1], version[2]]:
+                return None
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError, KeyError):
+        return None
+    return header["headers"], SnapshotRows(mm, header), _snapshot_dialect(header["dialect"])
+
+def write_snapshot(version, headers, rows, dialect):
+    """
+    Stores parsed rows beside the CSV file so the next cold load maps them instead of parsing.
+    Returns False when the rows can't be stored (a cell holding a NUL character) or the file can't be written.
+    """
+    column_count = max((len(row) for row in rows), default=0)
+    ragged = any(len(row) != column_count for row in rows)
+    sections = []
+    for j in range(column_count):
+        cells = [row[j] if j < len(row) else "" for row in rows]
+        if any(_SEPARATOR in cell for cell in cells):
+            return False
+        # Each cell is followed by a separator, offsets[i] is where cell i starts
+        offsets = array("q", accumulate([len(cell.encode("utf-8")) + 1 for cell in cells], initial=0))
+        blob = _SEPARATOR.join(cells).encode("utf-8")
+        sections.append((offsets.tobytes(), blob))
+    lengths = array("i", (len(row) for row in rows)).tobytes() if ragged else None
+
+    header = {
+        "source": [version[1], version[2]],
+        "headers": headers,
+        "dialect": {name: getattr(dialect, name) for name in _DIALECT_ATTRIBUTES},
+        "rows": len(rows),
+        "columns": [],
+        "lengths": None,
+    }
+    # Section positions depend on the header length, lay out until the header stops growing
+    header_size = 0
+    while True:
+        pos = _align(len(SNAPSHOT_MAGIC) + header_size)
+        header["columns"] = []
+        for offsets, blob in sections:
+            offsets_pos = pos
+            blob_pos = _align(offsets_pos + len(offsets))
+            header["columns"].append([offsets_pos, blob_pos, len(blob)])
+            pos = _align(blob_pos + len(blob))
+        header["lengths"] = pos if lengths is not None else None
+        encoded = json.dumps(header).encode("utf-8") + b"\n"
+        if len(encoded) <= header_size:
+            break
+        header_size = len(encoded) + 64
+
+    path = snapshot_path(version[0])
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(SNAPSHOT_MAGIC)
+                f.write(encoded.ljust(header_size - 1, b" ") + b"\n")
+                for (offsets, blob), (offsets_pos, blob_pos, _) in zip(sections, header["columns"]):
+                    f.seek(offsets_pos)
+                    f.write(offsets)
+                    f.seek(blob_pos)
+                    f.write(blob)
+                if lengths is not None:
+                    f.seek(header["lengths"])
+                    f.write(lengths)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    except OSError as e:
+        print(f"MaxCSV_Snapshot: Could not write snapshot for {version[0]}. Error: {e}")
+        return False
+    return True
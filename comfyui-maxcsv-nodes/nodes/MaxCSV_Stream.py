@@ -0,0 +1,288 @@
+import os
+import csv
+import bisect
+import random
+import itertools
+import threading
+from collections import OrderedDict
+from .MaxCSV_Cache import file_version
+from .MaxCSV_Dialect import detect_format
+from .MaxCSV_Cursor import RowKeys
+from .MaxText_Filter import row_matcher
+from .MaxMetrics import inc
+
+# Memory ceiling in MB, default 512: CSV files larger than this are read row by row instead of being loaded whole
+STREAM_THRESHOLD_ENV = "MAX_NODES_STREAM_THRESHOLD_MB"
+
+def _threshold_bytes(default_mb=512):
+    try:
+        return max(0, int(float(os.environ.get(STREAM_THRESHOLD_ENV, "") or default_mb) * 1024 * 1024))
+    except ValueError:
+        return default_mb * 1024 * 1024
+
+STREAM_THRESHOLD_BYTES = _threshold_bytes()
+# Row counts kept per (file version, filter)
+COUNT_CACHE_SIZE = 64
+# Most rows returned at once from a streamed file
+STREAM_WINDOW_MAX_ROWS = 10000
+# Cursor keys read at once from a streamed file, outside the cursor file lock
+STREAM_KEYS_CHUNK = 10000
+# Cursor keys kept per (file version, filter) of streamed files
+STREAM_KEYS_CACHE_SIZE = 4
+# Matching rows between two byte offsets remembered, reads start from the nearest one before the wanted row
+STREAM_CHECKPOINT_ROWS = 10000
+# Checkpoint lists kept per (file version, filter)
+CHECKPOINT_CACHE_SIZE = 64
+
+_counts = OrderedDict()
+_counts_lock = threading.Lock()
+_stream_keys = OrderedDict()
+_keys_lock = threading.Lock()
+_checkpoints = OrderedDict()
+_checkpoints_lock = threading.Lock()
+
+def should_stream(path):
+    """
+    True when path is over the memory ceiling and must not be loaded as a whole.
+    """
+    try:
+        return os.path.getsize(path) > STREAM_THRESHOLD_BYTES
+    except OSError:
+        return False
+
+def read_headers(path):
+    """
+    Returns the header row of a CSV file.
+    """
+    csv_format = detect_format(file_version(path))
+    with open(path, "r", encoding=csv_format.encoding) as f:
+        return next(csv.reader(f, csv_format.dialect), [])
+
+def _checkpoint_list(key, data_start):
+    # [(position among the matching rows, row id, byte offset of the row)], in position order
+    with _checkpoints_lock:
+        checkpoints = _checkpoints.get(key)
+        if checkpoints is None:
+            checkpoints = _checkpoints[key] = [(0, 0, data_start)]
+        _checkpoints.move_to_end(key)
+        if len(_checkpoints) > CHECKPOINT_CACHE_SIZE:
+            _checkpoints.popitem(last=False)
+        return checkpoints
+
+def _add_checkpoint(checkpoints, checkpoint):
+    with _checkpoints_lock:
+        if checkpoint[0] > checkpoints[-1][0]:
+            checkpoints.append(checkpoint)
+
+def _byte_lines(f, encoding, consumed):
+    # Decoded lines of f with the newlines text mode gives.
+    # consumed: [bytes read, True while the lines of a line ending in a lone \r are being read]
+    for line in f:
+        text = line.decode(encoding).replace("\r\n", "\n").replace("\r", "\n")
+        parts = [part + "\n" for part in text.split("\n")]
+        parts[-1] = parts[-1][:-1]
+        if not parts[-1]:
+            parts.pop()
+        consumed[1] = True
+        for i, part in enumerate(parts):
+            if i == len(parts) - 1:
+                consumed[0] += len(line)
+                consumed[1] = False
+            yield part
+
+def _scan_text(path, csv_format, filter_text, start):
+    # Files that can't be read by byte offset (UTF-16/32) are read from their first row
+    with open(path, "r", encoding=csv_format.encoding) as f:
+        reader = csv.reader(f, csv_format.dialect)
+        matches = row_matcher(filter_text, next(reader, []))
+        row_id = 0
+        position = 0
+        try:
+            for row in reader:
+                if not any(cell and cell.strip() for cell in row):
+                    continue
+                if matches(row):
+                    if position >= start:
+                        yield position, row_id, row
+                    position += 1
+                row_id += 1
+        finally:
+            inc("rows_scanned_total", "csv_stream", row_id)
+
+def scan_rows(path, filter_text="", start=0):
+    """
+    Yields (position, row id, row) for the non-empty data rows matching filter_text, from the
+    position-th matching row on. Reading seeks to the nearest checkpoint before it: the byte offset
+    of every STREAM_CHECKPOINT_ROWS-th matching row is remembered per file version and filter.
+    Row ids are positions among the non-empty rows, the same ids as CSVTable rows.
+    """
+    version = file_version(path)
+    csv_format = detect_format(version)
+    if not csv_format.ascii_compatible:
+        yield from _scan_text(path, csv_format, filter_text, start)
+        return
+    encoding = "utf-8" if csv_format.encoding == "utf-8-sig" else csv_format.encoding
+
+    with open(path, "rb") as f:
+        f.seek(csv_format.bom_length)
+        consumed = [csv_format.bom_length, False]
+        header = next(csv.reader(_byte_lines(f, encoding, consumed), csv_format.dialect), [])
+        if consumed[1]:
+            # The header ends inside a line: old Mac newlines, with no byte offset per row
+            yield from _scan_text(path, csv_format, filter_text, start)
+            return
+        matches = row_matcher(filter_text, header)
+        checkpoints = _checkpoint_list((version, filter_text or ""), consumed[0])
+
+        with _checkpoints_lock:
+            position, row_id, offset = checkpoints[bisect.bisect_right(checkpoints, (start, float("inf"))) - 1]
+        f.seek(offset)
+        consumed[:] = [offset, False]
+        reader = csv.reader(_byte_lines(f, encoding, consumed), csv_format.dialect)
+        scanned = 0
+        try:
+            while True:
+                record_start = None if consumed[1] else consumed[0]
+                row = next(reader, None)
+                if row is None:
+                    break
+                scanned += 1
+                if not any(cell and cell.strip() for cell in row):
+                    continue
+                if matches(row):
+                    if position % STREAM_CHECKPOINT_ROWS == 0 and record_start is not None:
+                        _add_checkpoint(checkpoints, (position, row_id, record_start))
+                    if position >= start:
+                        yield position, row_id, row
+                    position += 1
+                row_id += 1
+        finally:
+            # Counted once per pass, passes may stop early
+            inc("rows_scanned_total", "csv_stream", scanned)
+
+def iter_rows(path, filter_text=""):
+    """
+    Yields (row id, row) for the non-empty data rows matching filter_text, one row at a time.
+    Row ids are positions among the non-empty rows, the same ids as CSVTable rows.
+    """
+    for _, row_id, row in scan_rows(path, filter_text):
+        yield row_id, row
+
+def _count_key(path, filter_text):
+    return (file_version(path), filter_text or "")
+
+def cached_count(path, filter_text=""):
+    with _counts_lock:
+        return _counts.get(_count_key(path, filter_text))
+
+def _remember_count(key, count):
+    with _counts_lock:
+        _counts[key] = count
+        _counts.move_to_end(key)
+        if len(_counts) > COUNT_CACHE_SIZE:
+            _counts.popitem(last=False)
+
+def count_rows(path, filter_text=""):
+    """
+    Number of rows matching filter_text, counted once per file version.
+    """
+    key = _count_key(path, filter_text)
+    with _counts_lock:
+        count = _counts.get(key)
+    if count is None:
+        count = sum(1 for _ in iter_rows(path, filter_text))
+        _remember_count(key, count)
+    return count
+
+def rows_at(path, positions, filter_text=""):
+    """
+    Returns {position: row} for positions among the rows matching filter_text.
+    Reading stops after the last wanted position.
+    """
+    wanted = set(positions)
+    found = {}
+    if not wanted:
+        return found
+    last = max(wanted)
+    for position, _, row in scan_rows(path, filter_text, min(wanted)):
+        if position in wanted:
+            found[position] = row
+        if position >= last:
+            break
+    return found
+
+def sample_row(path, filter_text="", rng=random):
+    """
+    Reservoir sampling: returns (position, row) of a uniformly random matching row in a single pass,
+    or None when no row matches. The row count is cached on the way.
+    """
+    chosen = None
+    count = 0
+    for count, (_, row) in enumerate(iter_rows(path, filter_text), 1):
+        if rng.randrange(count) == 0:
+            chosen = (count - 1, row)
+    _remember_count(_count_key(path, filter_text), count)
+    return chosen
+
+def read_window(path, offset, limit, filter_text=""):
+    """
+    Returns (rows, total): up to limit matching rows starting at offset, and the number of matching rows.
+    Reading starts at the checkpoint before offset and stops after the window once the total is known.
+    """
+    key = _count_key(path, filter_text)
+    with _counts_lock:
+        total = _counts.get(key)
+    window = []
+    # Without a total the pass goes on to the end, so it starts at the first row to count them all
+    position = -1
+    for position, _, row in scan_rows(path, filter_text, offset if total is not None else 0):
+        if position >= offset + limit:
+            if total is not None:
+                break
+        elif position >= offset:
+            window.append(row)
+    if total is None:
+        total = position + 1
+        _remember_count(key, total)
+    return window, total
+
+class StreamRowKeys(RowKeys):
+    """
+    RowKeys of a streamed file, read STREAM_KEYS_CHUNK rows at a time as claims get to them.
+    """
+    def __init__(self, path, filter_text=""):
+        super().__init__()
+        self.complete = False
+        lower_headers = [h.strip().lower() for h in read_headers(path)]
+        self._filename_col = lower_headers.index('filename') if 'filename' in lower_headers else None
+        self._rows = iter_rows(path, filter_text)
+        self._lock = threading.Lock()
+
+    def more(self):
+        with self._lock:
+            if self.complete:
+                return False
+            read = 0
+            for row_id, row in itertools.islice(self._rows, STREAM_KEYS_CHUNK):
+                col = self._filename_col
+                self.add(row_id, row[col] if col is not None and col < len(row) else "")
+                read += 1
+            if read < STREAM_KEYS_CHUNK:
+                self.complete = True
+                self._rows.close()
+            return read > 0
+
+def stream_row_keys(path, filter_text=""):
+    """
+    StreamRowKeys of the rows matching filter_text, like MaxCSV_Cursor.table_row_keys.
+    Kept per (file version, filter), so a sweep goes on reading where the last claim stopped.
+    """
+    key = _count_key(path, filter_text)
+    with _keys_lock:
+        keys = _stream_keys.get(key)
+        if keys is None:
+            keys = _stream_keys[key] = StreamRowKeys(path, filter_text)
+        _stream_keys.move_to_end(key)
+        if len(_stream_keys) > STREAM_KEYS_CACHE_SIZE:
+            _stream_keys.popitem(last=False)
+        return keys
@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+
+# Minimum time between two checks of the directory modification times
+CATALOG_POLL_SECONDS = 2.0
+
+class DirectoryCatalog:
+    """
+    Cached recursive listing of a data directory, used to fill the node file/directory lists.
+    The tree is scanned once; later calls only stat the known directories
+    (at most every CATALOG_POLL_SECONDS) and rescan the ones whose mtime changed.
+    """
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        # relative dir -> (mtime_ns, file names, subdirectory names, subdirectories to walk into)
+        self._entries = {}
+        self._last_check = None
+        self._listings = {}
+        self._lock = threading.Lock()
+
+    def _full_path(self, rel_dir):
+        return os.path.join(self.root, rel_dir) if rel_dir else self.root
+
+    def _child(self, rel_dir, name):
+        return os.path.join(rel_dir, name) if rel_dir else name
+
+    def _drop(self, rel_dir):
+        prefix = rel_dir + os.sep
+        for key in [key for key in self._entries if key == rel_dir or key.startswith(prefix)]:
+            del self._entries[key]
+
+    def _scan_dir(self, rel_dir):
+        files, dirs, walk_dirs = [], [], []
+        try:
+            mtime = os.stat(self._full_path(rel_dir)).st_mtime_ns
+            with os.scandir(self._full_path(rel_dir)) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        dirs.append(entry.name)
+                        # Like os.walk, symlinked directories are listed but not walked into
+                        if not entry.is_symlink():
+                            walk_dirs.append(entry.name)
+                    else:
+                        files.append(entry.name)
+        except OSError:
+            self._drop(rel_dir)
+            return
+
+        old = self._entries.get(rel_dir)
+        self._entries[rel_dir] = (mtime, files, dirs, walk_dirs)
+
+        old_walk_dirs = set(old[3]) if old else set()
+        for name in old_walk_dirs - set(walk_dirs):
+            self._drop(self._child(rel_dir, name))
+        for name in walk_dirs:
+            child = self._child(rel_dir, name)
+            if child not in self._entries:
+                self._scan_dir(child)
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._last_check is not None and now - self._last_check < CATALOG_POLL_SECONDS:
+            return
+        self._last_check = now
+
+        changed = False
+        if not self._entries:
+            self._scan_dir("")
+            changed = True
+        else:
+            for rel_dir in list(self._entries):
+                entry = self._entries.get(rel_dir)
+                if entry is None:
+                    continue  # removed with its parent
+                try:
+                    mtime = os.stat(self._full_path(rel_dir)).st_mtime_ns
+                except OSError:
+                    self._drop(rel_dir)
+                    changed = True
+                    continue
+                if mtime != entry[0]:
+                    self._scan_dir(rel_dir)
+                    changed = True
+        if changed:
+            self._listings.clear()
+
+    def files(self, extension):
+        """
+        Sorted relative paths of the files ending with extension (case-insensitive).
+        """
+        extension = extension.lower()
+        with self._lock:
+            self._refresh()
+            key = ("files", extension)
+            if key not in self._listings:
+                self._listings[key] = sorted(
+                    self._child(rel_dir, name)
+                    for rel_dir, entry in self._entries.items()
+                    for name in entry[1]
+                    if name.lower().endswith(extension)
+                )
+            return list(self._listings[key])
+
+    def dirs(self):
+        """
+        Sorted relative paths of all subdirectories.
+        """
+        with self._lock:
+            self._refresh()
+            if "dirs" not in self._listings:
+                self._listings["dirs"] = sorted(
+                    self._child(rel_dir, name)
+                    for rel_dir, entry in self._entries.items()
+                    for name in entry[2]
+                )
+            return list(self._listings["dirs"])
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+def get_catalog(root):
+    """
+    Returns the shared DirectoryCatalog of a data directory.
+    """
+    root = os.path.abspath(root)
+    with _catalogs_lock:
+        catalog = _catalogs.get(root)
+        if catalog is None:
+            catalog = _catalogs[root] = DirectoryCatalog(root)
+        return catalog
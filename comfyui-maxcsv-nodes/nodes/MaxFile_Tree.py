@@ -0,0 +1,58 @@
+import os
+import threading
+
+# path -> (mtime_ns, subdirectory paths)
+_subdirectory_cache = {}
+_cache_lock = threading.Lock()
+
+def get_subdirectories(path):
+    """
+    Sorted paths of the subdirectories of path, rescanned only when the directory mtime changes.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return []
+    with _cache_lock:
+        cached = _subdirectory_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    subdirectories = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    subdirectories.append(entry.path)
+    except OSError:
+        pass
+    subdirectories.sort()
+
+    with _cache_lock:
+        _subdirectory_cache[path] = (mtime, subdirectories)
+    return subdirectories
+
+def get_directory_structure(path, depth=None):
+    """
+    Directory tree used by the file browsers.
+    depth limits how many levels of children are included (None for the whole tree);
+    "has_children" tells the browser whether a node can be expanded further.
+    """
+    subdirectories = get_subdirectories(path)
+    structure = {"name": os.path.basename(path), "children": [], "path": path, "expanded": False, "has_children": bool(subdirectories)}
+    if depth is None or depth > 0:
+        child_depth = None if depth is None else depth - 1
+        structure["children"] = [get_directory_structure(child, child_depth) for child in subdirectories]
+    return structure
+
+def parse_depth(value):
+    """
+    Reads a depth request parameter: a non-negative integer, or None when missing.
+    Raises ValueError for anything else.
+    """
+    if value is None or value == "":
+        return None
+    depth = int(value)
+    if depth < 0:
+        raise ValueError("depth must not be negative")
+    return depth
@@ -0,0 +1,194 @@
+import os
+import time
+import functools
+import threading
+from aiohttp import web
+from server import PromptServer  # type: ignore # - server is a part of ComfyUI Core
+from .MaxServer_Utils import get_route_timings
+
+# Set to 1 to collect metrics; when off, nodes and routes are not wrapped and counters return at once
+METRICS_ENV = "MAX_NODES_METRICS"
+ENABLED = os.environ.get(METRICS_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+# Prefix of every exported metric name
+METRIC_PREFIX = "max_nodes_"
+
+# Counters: name -> (label name, help text)
+COUNTERS = {
+    "cache_hits_total": ("cache", "Lookups answered from an in-memory cache"),
+    "cache_misses_total": ("cache", "Lookups that had to read or build the value"),
+    "bytes_read_total": ("source", "Bytes read from files"),
+    "rows_scanned_total": ("source", "Rows or texts scanned"),
+    "errors_total": ("span", "Instrumented calls that raised an exception"),
+}
+
+# (counter name, label value) -> value
+_counters = {}
+# span name -> [count, total seconds, max seconds]
+_spans = {}
+_lock = threading.Lock()
+# Routes registered before the node modules were imported are not ours to wrap
+_first_route = len(PromptServer.instance.routes)
+
+def inc(name, label, amount=1):
+    """
+    Adds amount to a counter of COUNTERS, for one value of its label.
+    """
+    if not ENABLED:
+        return
+    key = (name, label)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+def cache_lookup(cache, hit):
+    """
+    Counts a hit or a miss of cache.
+    """
+    if ENABLED:
+        inc("cache_hits_total" if hit else "cache_misses_total", cache)
+
+def _record_span(name, seconds, failed):
+    with _lock:
+        span = _spans.get(name)
+        if span is None:
+            span = _spans[name] = [0, 0.0, 0.0]
+        span[0] += 1
+        span[1] += seconds
+        if seconds > span[2]:
+            span[2] = seconds
+        if failed:
+            key = ("errors_total", name)
+            _counters[key] = _counters.get(key, 0) + 1
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _record_span(self.name, time.perf_counter() - self.start, exc_type is not None)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name):
+    """
+    Context manager timing a block of code under name, e.g. with span("csv_parse"): ...
+    """
+    return _Span(name) if ENABLED else _NULL_SPAN
+
+def _wrap_node(node_name, method):
+    span_name = f"node/{node_name}"
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with _Span(span_name):
+            return method(*args, **kwargs)
+    wrapper._max_metrics = True
+    return wrapper
+
+def instrument_nodes(node_class_mappings):
+    """
+    Times the FUNCTION of every node class. Does nothing when metrics are off.
+    """
+    if not ENABLED:
+        return
+    for node_name, node_class in node_class_mappings.items():
+        method = getattr(node_class, getattr(node_class, "FUNCTION", ""), None)
+        if callable(method) and not getattr(method, "_max_metrics", False):
+            setattr(node_class, node_class.FUNCTION, _wrap_node(node_name, method))
+
+def _wrap_route(route_name, handler):
+    @functools.wraps(handler)
+    async def wrapper(request):
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = await handler(request)
+            failed = response.status >= 500
+            return response
+        finally:
+            _record_span(route_name, time.perf_counter() - start, failed)
+    return wrapper
+
+def instrument_routes():
+    """
+    Times the routes registered on PromptServer by this node pack. Does nothing when metrics are off.
+    Must run before ComfyUI adds the routes to its app, i.e. while the node pack is imported.
+    """
+    routes = PromptServer.instance.routes
+    # RouteTableDef has no public way to replace a route
+    items = getattr(routes, "_items", None)
+    if not ENABLED or items is None:
+        return
+    for i in range(_first_route, len(items)):
+        route = items[i]
+        if isinstance(route, web.RouteDef):
+            items[i] = web.RouteDef(route.method, route.path, _wrap_route(f"route/{route.method} {route.path}", route.handler), route.kwargs)
+
+def get_metrics():
+    """
+    Returns the collected metrics as a dict: counters, spans and the worker pool timings of run_blocking.
+    """
+    with _lock:
+        counters = {}
+        for (name, label), value in _counters.items():
+            counters.setdefault(name, {})[label] = value
+        spans = {name: {"count": s[0], "total_seconds": s[1], "max_seconds": s[2]} for name, s in _spans.items()}
+    return {"enabled": ENABLED, "counters": counters, "spans": spans, "blocking": get_route_timings()}
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _summary_lines(lines, name, help_text, label_name, values):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} summary")
+    for key, timing in sorted(values.items()):
+        labels = f'{{{label_name}="{_label(key)}"}}'
+        lines.append(f"{name}_count{labels} {timing['count']}")
+        lines.append(f"{name}_sum{labels} {timing['total_seconds']:.6f}")
+    max_name = name.replace("_seconds", "_max_seconds")
+    lines.append(f"# HELP {max_name} Longest single call")
+    lines.append(f"# TYPE {max_name} gauge")
+    for key, timing in sorted(values.items()):
+        lines.append(f'{max_name}{{{label_name}="{_label(key)}"}} {timing["max_seconds"]:.6f}')
+
+def prometheus_text(metrics=None):
+    """
+    Formats metrics (default: get_metrics()) in the Prometheus text exposition format.
+    """
+    metrics = metrics or get_metrics()
+    lines = [
+        f"# HELP {METRIC_PREFIX}metrics_enabled 1 when {METRICS_ENV} is set",
+        f"# TYPE {METRIC_PREFIX}metrics_enabled gauge",
+        f"{METRIC_PREFIX}metrics_enabled {int(metrics['enabled'])}",
+    ]
+    for name, (label_name, help_text) in COUNTERS.items():
+        lines.append(f"# HELP {METRIC_PREFIX}{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}{name} counter")
+        for label, value in sorted(metrics["counters"].get(name, {}).items()):
+            lines.append(f'{METRIC_PREFIX}{name}{{{label_name}="{_label(label)}"}} {value}')
+    _summary_lines(lines, f"{METRIC_PREFIX}span_seconds", "Time spent in nodes, routes and instrumented steps", "span", metrics["spans"])
+    _summary_lines(lines, f"{METRIC_PREFIX}blocking_seconds", "Time spent in the route worker pool", "route", metrics["blocking"])
+    return "\n".join(lines) + "\n"
+
+@PromptServer.instance.routes.get("/max_nodes/metrics")
+async def metrics_prometheus(request):
+    return web.Response(text=prometheus_text(), content_type="text/plain", charset="utf-8", headers={"Cache-Control": "no-store"})
+
+@PromptServer.instance.routes.get("/max_nodes/metrics.json")
+async def metrics_json(request):
+    return web.json_response(get_metrics(), headers={"Cache-Control": "no-store"})
@@ -0,0 +1,170 @@
+import os
+import json
+import stat
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from .MaxMetrics import inc
+
+# Total size of prompt texts kept in memory
+PROMPT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Threads reading prompt files that are not cached yet
+PROMPT_READ_WORKERS = 8
+# Below this many files, files are stat'ed one by one instead of scanning the directory
+SCAN_THRESHOLD = 16
+# Archive written by pack_prompt_directory
+PACK_FILE_NAME = ".prompts.pack"
+
+# full path -> (mtime_ns, size, text)
+_content_cache = OrderedDict()
+_content_bytes = 0
+_cache_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=PROMPT_READ_WORKERS, thread_name_prefix="max_nodes_prompts")
+        return _pool
+
+def _decode(data):
+    # Same result as reading the file in text mode
+    return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+def _remember(path, mtime_ns, size, text):
+    global _content_bytes
+    with _cache_lock:
+        old = _content_cache.pop(path, None)
+        if old is not None:
+            _content_bytes -= len(old[2])
+        _content_cache[path] = (mtime_ns, size, text)
+        _content_bytes += len(text)
+        while _content_bytes > PROMPT_CACHE_MAX_BYTES and _content_cache:
+            _, (_, _, old_text) = _content_cache.popitem(last=False)
+            _content_bytes -= len(old_text)
+
+def _file_stats(directory, files):
+    # name -> (mtime_ns, size) for the files that exist
+    stats = {}
+    if len(files) < SCAN_THRESHOLD:
+        for name in files:
+            try:
+                st = os.stat(os.path.join(directory, name))
+            except OSError:
+                continue
+            if stat.S_ISREG(st.st_mode):
+                stats[name] = (st.st_mtime_ns, st.st_size)
+        return stats
+    wanted = set(files)
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name in wanted and entry.is_file():
+                st = entry.stat()
+                stats[entry.name] = (st.st_mtime_ns, st.st_size)
+    return stats
+
+def _read_pack(directory, stats):
+    """
+    Returns {name: text} for the packed files whose mtime and size still match.
+    """
+    pack_path = os.path.join(directory, PACK_FILE_NAME)
+    try:
+        with open(pack_path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return {}
+    header_end = data.find(b"\n")
+    packed = {}
+    try:
+        entries = json.loads(data[:header_end].decode("utf-8"))["files"]
+        for name, mtime_ns, size, offset, length in entries:
+            if stats.get(name) == (mtime_ns, size):
+                start = header_end + 1 + offset
+                packed[name] = _decode(data[start:start + length])
+    except (ValueError, KeyError, TypeError):
+        # A malformed or truncated pack: the files are read one by one
+        return {}
+    return packed
+
+def _read_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def read_prompt_files(directory, files):
+    """
+    Returns the text of each existing file of files (in order), reading only files that changed.
+    Files not in memory are taken from the directory pack when it's up to date,
+    otherwise read in parallel.
+    """
+    stats = _file_stats(directory, files)
+    texts = {}
+    missing = []
+    with _cache_lock:
+        for name in dict.fromkeys(files):
+            if name not in stats:
+                continue
+            path = os.path.join(directory, name)
+            cached = _content_cache.get(path)
+            if cached is not None and cached[:2] == stats[name]:
+                _content_cache.move_to_end(path)
+                texts[name] = cached[2]
+            else:
+                missing.append(name)
+    inc("cache_hits_total", "prompt_files", len(texts))
+    inc("cache_misses_total", "prompt_files", len(missing))
+
+    if missing:
+        if len(missing) >= SCAN_THRESHOLD:
+            missing_names = set(missing)
+            for name, text in _read_pack(directory, stats).items():
+                if name in missing_names:
+                    texts[name] = text
+                    _remember(os.path.join(directory, name), *stats[name], text)
+            missing = [name for name in missing if name not in texts]
+        paths = [os.path.join(directory, name) for name in missing]
+        if len(paths) > 1:
+            results = _get_pool().map(_read_file, paths)
+        else:
+            results = map(_read_file, paths)
+        for name, path, text in zip(missing, paths, results):
+            texts[name] = text
+            _remember(path, *stats[name], text)
+            inc("bytes_read_total", "prompt_files", stats[name][1])
+
+    return [texts[name] for name in files if name in texts]
+
+def pack_prompt_directory(directory):
+    """
+    Writes all .txt files of directory into one archive, so a cold load is a single sequential read.
+    The archive is only used for files whose mtime and size still match. Returns the number of packed files.
+    """
+    names = sorted(f for f in os.listdir(directory) if f.lower().endswith(".txt"))
+    entries = []
+    chunks = []
+    offset = 0
+    for name in names:
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            continue
+        st = os.stat(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        entries.append([name, st.st_mtime_ns, st.st_size, offset, len(data)])
+        chunks.append(data)
+        offset += len(data)
+
+    header = json.dumps({"files": entries}).encode("utf-8") + b"\n"
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.writelines(chunks)
+        os.replace(tmp_path, os.path.join(directory, PACK_FILE_NAME))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(entries)
@@ -1,10 +1,15 @@
 from server import PromptServer  # type: ignore // ComfyUI Core
 import os
 import re
-from PIL import Image
 from aiohttp import web
-import io
 import random
+from .MaxText_Filter import TextIndex
+from .MaxServer_Utils import run_blocking, json_response_with_etag
+from .MaxFile_Tree import get_directory_structure, parse_depth
+from .MaxThumbnail_Cache import get_thumbnail, get_thumbnails, THUMBNAIL_CONTENT_TYPE
+from .MaxFile_Catalog import get_catalog
+from .MaxPrompt_Cache import read_prompt_files, pack_prompt_directory
+from .MaxSampling import LIST_SAMPLING_MODES, SamplingPlan, seeded_version_key
 
 root_dir = os.path.dirname(os.path.abspath(__file__))
 prompts_path = os.path.abspath(os.path.join(root_dir, "../prompts"))
@@ -14,12 +19,7 @@ class Max_Prompt_Loader:
     def INPUT_TYPES(cls):
         global prompts_path
         try:
-            prompt_dirs = []
-            for root, dirs, files in os.walk(prompts_path):
-                for d in dirs:
-                    full_path = os.path.join(root, d)
-                    rel_path = os.path.relpath(full_path, prompts_path)
-                    prompt_dirs.append(rel_path)
+            prompt_dirs = get_catalog(prompts_path).dirs()
         except Exception:
             prompt_dirs = []
 
@@ -31,6 +31,8 @@ class Max_Prompt_Loader:
             "optional": {
                 "filter_text": ("STRING", {"default": ""}),
                 "selected_files": ("STRING", {"default": ""}),
+                "seed": ("INT", {"default": -1, "min": -1, "max": 0xffffffffffffffff}),
+                "sampling": (LIST_SAMPLING_MODES, {"default": "uniform"}),
             }
         }
 
@@ -47,9 +49,11 @@ Selection types:
 - single: Select one file at a time
 - multiple: Select multiple files (comma-separated)
 - random: Randomly select one file on each prompt queue
+  With a seed (0 or more) the choice is reproducible; with shuffle sampling,
+  consecutive seeds never repeat a file until all files were used
 """
 
-    def browse_files(self, prompt_directory, selection_type="single", selected_files="", filter_text=""):
+    def browse_files(self, prompt_directory, selection_type="single", selected_files="", filter_text="", seed=-1, sampling="uniform"):
         global prompts_path
         prompt_directory = os.path.join(prompts_path, prompt_directory)
         prompt_directory = os.path.abspath(prompt_directory)
@@ -66,12 +70,15 @@ Selection types:
             if selected_files:
                 selected_files_list = [f.strip() for f in selected_files.split(",")]
                 valid_selected_files = [f for f in selected_files_list if f in files]
-                if valid_selected_files:
-                    selected = random.choice(valid_selected_files)
-                else:
-                    selected = random.choice(files)
+                candidates = valid_selected_files or files
+            else:
+                candidates = files
+            if seed is not None and seed >= 0:
+                # Directory listing order is arbitrary, sort so the same seed gives the same file
+                candidates = sorted(candidates)
+                selected = candidates[SamplingPlan(len(candidates)).draw(sampling, seed)]
             else:
-                selected = random.choice(files)
+                selected = random.choice(candidates)
             selected_list = [selected]
         elif selection_type == "multiple":
             if selected_files:
@@ -84,42 +91,25 @@ Selection types:
 
         # Main output
         if selection_type == "multiple":
-            prompt_texts = []
-            for file in selected_list:
-                file = file.strip()
-                if file in files:
-                    txt_path = os.path.join(prompt_directory, file)
-                    if os.path.isfile(txt_path):
-                        with open(txt_path, "r", encoding="utf-8") as f:
-                            prompt_texts.append(f.read())
-            prompt_text = "\n".join(prompt_texts)
+            prompt_text = "\n".join(read_prompt_files(prompt_directory, [file.strip() for file in selected_list]))
         else:
-            txt_path = os.path.join(prompt_directory, selected_list[0])
-            prompt_text = ""
-            if os.path.isfile(txt_path):
-                with open(txt_path, "r", encoding="utf-8") as f:
-                    prompt_text = f.read()
+            prompt_texts = read_prompt_files(prompt_directory, selected_list[:1])
+            prompt_text = prompt_texts[0] if prompt_texts else ""
 
         # List output: if 0 or 1 selected, output all prompts; else output selected_list
         if len(selected_list) <= 1:
-            all_output = []
-            for file in files:
-                txt_path = os.path.join(prompt_directory, file)
-                if os.path.isfile(txt_path):
-                    with open(txt_path, "r", encoding="utf-8") as f:
-                        all_output.append(f.read())
+            all_output = read_prompt_files(prompt_directory, files)
         else:
-            all_output = []
-            for file in selected_list:
-                txt_path = os.path.join(prompt_directory, file)
-                if os.path.isfile(txt_path):
-                    with open(txt_path, "r", encoding="utf-8") as f:
-                        all_output.append(f.read())
+            all_output = read_prompt_files(prompt_directory, selected_list)
 
         return (prompt_text, prompt_directory, all_output)
 
     @classmethod
-    def IS_CHANGED(cls, selection_type, prompt_directory, selected_files="", filter_text=""):
+    def IS_CHANGED(cls, selection_type, prompt_directory, selected_files="", filter_text="", seed=-1, sampling="uniform"):
+        if selection_type == "random" and seed is not None and seed >= 0:
+            # The directory mtime changes when prompt files are added, removed or renamed
+            version = seeded_version_key(os.path.join(prompts_path, prompt_directory), seed)
+            return f"{version}:{sampling}:{selected_files}:{filter_text}"
         if selection_type == "random":
             return float('nan')
         return selected_files + str(prompt_directory) + str(selection_type)
@@ -139,29 +129,12 @@ Selection types:
         return True
 
 
-def get_directory_structure(path):
-    structure = {"name": os.path.basename(path), "children": [], "path": path, "expanded": False}
-    try:
-        with os.scandir(path) as entries:
-            for entry in entries:
-                if entry.is_dir():
-                    structure["children"].append(get_directory_structure(entry.path))
-    except PermissionError:
-        pass
-    return structure
-
 def get_file_list(path, filter_text=""):
-    result = []
-    filter_text = (filter_text or "").lower()
-
-    for f in os.listdir(path):
-        if f.lower().endswith(".txt"):
-            base_name = os.path.splitext(f)[0]
+    result = [f for f in os.listdir(path) if f.lower().endswith(".txt")]
 
-            if filter_text and filter_text not in base_name.lower():
-                continue
-
-            result.append(f)
+    if filter_text:
+        base_names = [os.path.splitext(f)[0] for f in result]
+        result = [result[i] for i in TextIndex(["name"], base_names).search(filter_text)]
 
     return result
 
@@ -171,6 +144,10 @@ async def api_get_directory_structure(request):
     data = await request.json()
     path = data.get("path", "./")
     filter_text = data.get("filter", "")
+    try:
+        depth = parse_depth(data.get("depth"))
+    except (TypeError, ValueError):
+        return web.json_response({"error": "Invalid depth"}, status=400)
 
     if not os.path.isabs(path):
         path = os.path.abspath(path)
@@ -178,9 +155,32 @@ async def api_get_directory_structure(request):
     if not os.path.exists(path):
         return web.json_response({"error": "Directory does not exist"}, status=400)
 
-    structure = get_directory_structure(path)
+    response_data = await run_blocking("file_directory_structure", _get_file_browser_data, path, filter_text, depth, key=(path, filter_text, depth))
+    return json_response_with_etag(request, response_data)
+
+def _get_file_browser_data(path, filter_text, depth=None):
+    structure = get_directory_structure(path, depth)
     files = get_file_list(path, filter_text)
-    return web.json_response({"structure": structure, "files": files})
+    return {"structure": structure, "files": files}
+
+
+@PromptServer.instance.routes.get("/max_file_browser/get_children")
+async def api_get_children(request):
+    # Expands one node of the directory tree: ?path=...&depth=1
+    path = request.query.get("path", "./")
+    try:
+        depth = parse_depth(request.query.get("depth", "1"))
+    except ValueError:
+        return web.json_response({"error": "Invalid depth"}, status=400)
+
+    if not os.path.isabs(path):
+        path = os.path.abspath(path)
+
+    if not os.path.isdir(path):
+        return web.json_response({"error": "Directory does not exist"}, status=400)
+
+    structure = await run_blocking("file_get_children", get_directory_structure, path, depth, key=(path, depth))
+    return json_response_with_etag(request, structure)
 
 
 @PromptServer.instance.routes.post("/max_file_browser/get_thumbnail")
@@ -197,15 +197,62 @@ async def api_get_thumbnail(request):
         return web.json_response({"error": "File does not exist"}, status=400)
 
     try:
-        with Image.open(full_path) as img:
-            img.thumbnail((80, 80))
-            buf = io.BytesIO()
-            img.save(buf, format='PNG')
-            buf.seek(0)
-            return web.Response(body=buf.read(), content_type='image/png')
+        body, key = await run_blocking("thumbnail", get_thumbnail, full_path, key=full_path)
+        etag = f'"{key}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag in request.headers.get("If-None-Match", ""):
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=body, content_type=THUMBNAIL_CONTENT_TYPE, headers=headers)
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+
+@PromptServer.instance.routes.post("/max_file_browser/get_thumbnails")
+async def api_get_thumbnails(request):
+    # Thumbnails of many prompt files in one request: {"path": dir, "files": ["a.txt", ...]}
+    data = await request.json()
+    path = data.get("path", "./")
+    files = data.get("files", [])
+
+    if not os.path.isabs(path):
+        path = os.path.abspath(path)
+
+    if not os.path.isdir(path):
+        return web.json_response({"error": "Directory does not exist"}, status=400)
+    if not isinstance(files, list):
+        return web.json_response({"error": "files must be a list"}, status=400)
+
+    try:
+        files = [str(f) for f in files]
+        thumbnails = await run_blocking("thumbnails", get_thumbnails, path, files, key=(path, tuple(files)))
+        return web.json_response({"thumbnails": thumbnails})
     except Exception as e:
         return web.json_response({"error": str(e)}, status=500)
     
+@PromptServer.instance.routes.post("/max_file_browser/pack_directory")
+async def api_pack_directory(request):
+    # Packs the prompt files of a directory into one archive for faster cold loads
+    data = await request.json()
+    rel_path = data.get("relative_path", "")
+
+    # Resolved with links, and compared by path components: prompts2/ starts with the text of prompts/ too
+    root = os.path.realpath(prompts_path)
+    full_path = os.path.realpath(os.path.join(prompts_path, str(rel_path)))
+    try:
+        inside = os.path.commonpath([full_path, root]) == root
+    except ValueError:  # Another drive on Windows
+        inside = False
+    if not inside:
+        return web.json_response({"error": "Invalid path"}, status=400)
+
+    if not os.path.isdir(full_path):
+        return web.json_response({"error": "Directory not found"}, status=404)
+
+    try:
+        count = await run_blocking("pack_directory", pack_prompt_directory, full_path, key=full_path)
+        return web.json_response({"packed_files": count})
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+
 @PromptServer.instance.routes.post("/max_file_browser/get_file_info")
 async def get_file_info(request):
     # global prompts_path
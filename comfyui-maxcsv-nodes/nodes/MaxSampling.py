@@ -0,0 +1,123 @@
+import os
+import random
+import bisect
+from functools import lru_cache
+from itertools import accumulate
+
+# Sampling modes of the CSV loaders (weighted and stratified need a column)
+SAMPLING_MODES = ["uniform", "weighted", "shuffle", "stratified"]
+# Sampling modes of the loaders picking from plain lists
+LIST_SAMPLING_MODES = ["uniform", "shuffle"]
+
+@lru_cache(maxsize=16)
+def _permutation(size, epoch):
+    order = list(range(size))
+    random.Random(f"shuffle:{size}:{epoch}").shuffle(order)
+    return order
+
+def _parse_weight(value):
+    try:
+        weight = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return weight if weight > 0 else 0.0
+
+class SamplingPlan:
+    """
+    Precomputed data for seeded sampling from a population of size items.
+    weights: optional weight per item (missing, invalid or negative weights count as 0)
+    labels: optional category per item, used by 'stratified'
+    Every draw is deterministic for a seed:
+    - uniform: any item with the same probability
+    - weighted: items in proportion to their weight, by bisecting the cumulative weights
+    - shuffle: consecutive seeds walk through a shuffled order, so no item repeats
+      until all were drawn (seed // size picks the shuffle, seed % size the position)
+    - stratified: consecutive seeds cycle through the categories, then draw (weighted) inside one
+    """
+    def __init__(self, size, weights=None, labels=None):
+        self.size = size
+        self.cumulative = None
+        if weights is not None:
+            cumulative = list(accumulate(_parse_weight(w) for w in weights))
+            if cumulative and cumulative[-1] > 0:
+                self.cumulative = cumulative
+        self.strata = None
+        if labels is not None:
+            groups = {}
+            for position, label in enumerate(labels):
+                groups.setdefault(label.strip().lower(), []).append(position)
+            self.strata = [(group, self._group_cumulative(group)) for group in groups.values()]
+
+    def _group_cumulative(self, group):
+        if self.cumulative is None:
+            return None
+        weights = [self.cumulative[i] - (self.cumulative[i - 1] if i else 0.0) for i in group]
+        cumulative = list(accumulate(weights))
+        return cumulative if cumulative[-1] > 0 else None
+
+    def _weighted(self, rng, cumulative):
+        return bisect.bisect_right(cumulative, rng.random() * cumulative[-1])
+
+    def draw(self, mode, seed):
+        """
+        Returns the position of the item drawn for seed.
+        """
+        rng = random.Random(seed)
+        if mode == "weighted" and self.cumulative is not None:
+            return min(self._weighted(rng, self.cumulative), self.size - 1)
+        if mode == "shuffle":
+            epoch, position = divmod(seed, self.size)
+            return _permutation(self.size, epoch)[position]
+        if mode == "stratified" and self.strata:
+            group, cumulative = self.strata[seed % len(self.strata)]
+            if cumulative is not None:
+                return group[min(self._weighted(rng, cumulative), len(group) - 1)]
+            return group[rng.randrange(len(group))]
+        return rng.randrange(self.size)
+
+def find_column(headers, name):
+    """
+    Index of the column called name (case-insensitive), or None.
+    """
+    name = (name or "").strip().lower()
+    if not name:
+        return None
+    lower_headers = [h.strip().lower() for h in headers]
+    return lower_headers.index(name) if name in lower_headers else None
+
+def get_table_plan(table, row_ids, filter_text="", weight_column="", category_column=""):
+    """
+    SamplingPlan over the rows row_ids of a CSVTable, kept with the table version for recent filters.
+    """
+    weight_index = find_column(table.field_names, weight_column)
+    category_index = find_column(table.field_names, category_column)
+
+    weights = None if weight_index is None else table.column(weight_index)
+    categories = None if category_index is None else table.column(category_index)
+
+    def build(table):
+        def values(column):
+            if column is None:
+                return None
+            return [column[i] for i in row_ids]
+        return SamplingPlan(len(row_ids), values(weights), values(categories))
+
+    return table.filtered(("sampling", filter_text, weight_index, category_index), build)
+
+def batch_index_from(extra_pnginfo):
+    """
+    Position of the current prompt in a queued batch, 0 when not available.
+    """
+    if extra_pnginfo and 'workflow' in extra_pnginfo and 'extra' in extra_pnginfo['workflow']:
+        return extra_pnginfo['workflow']['extra'].get('batch_index', 0)
+    return 0
+
+def seeded_version_key(path, seed):
+    """
+    IS_CHANGED key of seeded random selections: same file version and seed give the same result.
+    """
+    try:
+        st = os.stat(path)
+        return f"{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}:{seed}"
+    except OSError:
+        return f"{path}:{seed}"
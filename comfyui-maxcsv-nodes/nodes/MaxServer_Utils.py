@@ -0,0 +1,80 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
+
+# Worker threads shared by all routes doing file I/O
+ROUTE_WORKERS = 4
+# Requests of one route allowed to run at the same time
+ROUTE_CONCURRENCY = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+_route_limits = {}
+_in_flight = {}
+_timings = {}
+_timings_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=ROUTE_WORKERS, thread_name_prefix="max_nodes_io")
+        return _executor
+
+def _record_timing(route, seconds):
+    with _timings_lock:
+        timing = _timings.setdefault(route, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+        timing["count"] += 1
+        timing["total_seconds"] += seconds
+        timing["max_seconds"] = max(timing["max_seconds"], seconds)
+
+def get_route_timings():
+    """
+    Returns a copy of the timings of the work run through run_blocking, per route.
+    """
+    with _timings_lock:
+        return {route: dict(timing) for route, timing in _timings.items()}
+
+async def _run_limited(route, func, args):
+    loop = asyncio.get_running_loop()
+    limit = _route_limits.get((route, loop))
+    if limit is None:
+        limit = _route_limits[(route, loop)] = asyncio.Semaphore(ROUTE_CONCURRENCY)
+    async with limit:
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(_get_executor(), func, *args)
+        finally:
+            _record_timing(route, time.perf_counter() - start)
+
+async def run_blocking(route, func, *args, key=None):
+    """
+    Runs func(*args) in the shared worker pool so blocking file I/O doesn't stall the server.
+    Requests of the same route with the same key share the result of the call already in progress.
+    """
+    if key is None:
+        return await _run_limited(route, func, args)
+
+    flight_key = (route, key)
+    future = _in_flight.get(flight_key)
+    if future is None:
+        future = asyncio.ensure_future(_run_limited(route, func, args))
+        _in_flight[flight_key] = future
+        future.add_done_callback(lambda _: _in_flight.pop(flight_key, None))
+    # A cancelled request must not cancel the call other requests are waiting on
+    return await asyncio.shield(future)
+
+def json_response_with_etag(request, data):
+    """
+    JSON response carrying an ETag; answers 304 when the client sent the same ETag in If-None-Match.
+    """
+    body = json.dumps(data)
+    etag = '"%s"' % hashlib.sha1(body.encode("utf-8")).hexdigest()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("If-None-Match", ""):
+        return web.Response(status=304, headers=headers)
+    return web.Response(text=body, content_type="application/json", headers=headers)
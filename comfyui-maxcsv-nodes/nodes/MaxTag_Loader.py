@@ -3,22 +3,26 @@ import os
 import random
 from aiohttp import web
 import json
+from .MaxCSV_Cache import FileCache
+from .MaxText_Filter import TextIndex
+from .MaxServer_Utils import run_blocking, json_response_with_etag
+from .MaxFile_Tree import get_directory_structure, parse_depth
+from .MaxFile_Catalog import get_catalog
+from .MaxSampling import LIST_SAMPLING_MODES, SamplingPlan, seeded_version_key
+from .MaxMetrics import inc
 
 root_dir = os.path.dirname(os.path.abspath(__file__))
 tags_path = os.path.abspath(os.path.join(root_dir, "../tags"))
 
+# Total size of tag files kept in memory
+TAGS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
 class Max_Tag_Loader:
     @classmethod
     def INPUT_TYPES(cls):
         global tags_path
         try:
-            txt_files = []
-            for root, dirs, files in os.walk(tags_path):
-                for f in files:
-                    if f.lower().endswith('.txt'):
-                        full_path = os.path.join(root, f)
-                        rel_path = os.path.relpath(full_path, tags_path)
-                        txt_files.append(rel_path)
+            txt_files = get_catalog(tags_path).files('.txt')
         except Exception as e:
             txt_files = []
 
@@ -30,6 +34,8 @@ class Max_Tag_Loader:
             "optional": {
                 "filter_text": ("STRING", {"default": ""}),
                 "selected_tags": ("STRING", {"default": ""}),
+                "seed": ("INT", {"default": -1, "min": -1, "max": 0xffffffffffffffff}),
+                "sampling": (LIST_SAMPLING_MODES, {"default": "uniform"}),
             }
         }
 
@@ -47,9 +53,11 @@ Selection types:
 - single: Select one tag at a time
 - multiple: Select multiple tags (comma-separated)
 - random: Randomly select one tag on each prompt queue
+  With a seed (0 or more) the choice is reproducible; with shuffle sampling,
+  consecutive seeds never repeat a tag until all tags were used
 """
 
-    def browse_tags(self, tags_file, selection_type="single", selected_tags="", filter_text=""):
+    def browse_tags(self, tags_file, selection_type="single", selected_tags="", filter_text="", seed=-1, sampling="uniform"):
         global tags_path
         tags_file = os.path.join(tags_path, tags_file)
         tags_file = os.path.abspath(tags_file)
@@ -58,15 +66,15 @@ Selection types:
             return ("No tags file found", tags_file, [])
 
         # Read tags from file
-        with open(tags_file, "r", encoding="utf-8") as f:
-            tags = [line.strip() for line in f.readlines() if line.strip()]
+        tag_file = load_tag_file(tags_file)
+        tags = tag_file.tags
 
         if not tags:
             return ("No tags found in file", tags_file, [])
 
         # Filter tags if filter_text is provided
         if filter_text:
-            tags = [tag for tag in tags if filter_text.lower() in tag.lower()]
+            tags = tag_file.search(filter_text)
 
         if not tags:
             return ("No matching tags found", tags_file, [])
@@ -77,12 +85,13 @@ Selection types:
             if selected_tags:
                 selected_tags_list = [tag.strip() for tag in selected_tags.split(",")]
                 valid_selected_tags = [tag for tag in selected_tags_list if tag in tags]
-                if valid_selected_tags:
-                    selected = random.choice(valid_selected_tags)
-                else:
-                    selected = random.choice(tags)
+                candidates = valid_selected_tags or tags
             else:
-                selected = random.choice(tags)
+                candidates = tags
+            if seed is not None and seed >= 0:
+                selected = candidates[SamplingPlan(len(candidates)).draw(sampling, seed)]
+            else:
+                selected = random.choice(candidates)
             selected_list = [selected]
         elif selection_type == "multiple":
             if selected_tags:
@@ -105,7 +114,10 @@ Selection types:
         return (main_output, tags_file, all_output)
 
     @classmethod
-    def IS_CHANGED(cls, selection_type, tags_file, selected_tags="", filter_text=""):
+    def IS_CHANGED(cls, selection_type, tags_file, selected_tags="", filter_text="", seed=-1, sampling="uniform"):
+        if selection_type == "random" and seed is not None and seed >= 0:
+            version = seeded_version_key(os.path.join(tags_path, tags_file), seed)
+            return f"{version}:{sampling}:{selected_tags}:{filter_text}"
         if selection_type == "random":
             return float('nan')
         return selected_tags + str(tags_file) + str(selection_type)
@@ -119,28 +131,38 @@ Selection types:
             return "Tags file does not exist"
         return True
 
-def get_directory_structure(path):
-    structure = {"name": os.path.basename(path), "children": [], "path": path, "expanded": False}
-    try:
-        with os.scandir(path) as entries:
-            for entry in entries:
-                if entry.is_dir():
-                    structure["children"].append(get_directory_structure(entry.path))
-    except PermissionError:
-        pass
-    return structure
+class TagFile:
+    """
+    Tags read from a file (one per line), shared between the node and the browser route.
+    """
+    def __init__(self, version, tags):
+        self.version = version
+        self.tags = tags
+        self.index = TextIndex(["tag"], tags)
+
+    def search(self, filter_text):
+        return [self.tags[i] for i in self.index.search(filter_text)]
+
+def _read_tag_file(version):
+    with open(version[0], "r", encoding="utf-8") as f:
+        tags = [line.strip() for line in f.readlines() if line.strip()]
+    inc("bytes_read_total", "tags", version[2])
+    return TagFile(version, tags)
+
+_tag_cache = FileCache(TAGS_CACHE_MAX_BYTES, name="tags")
+
+def load_tag_file(path):
+    return _tag_cache.get(path, _read_tag_file)
 
 def get_tags_from_file(file_path, filter_text=""):
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            tags = [line.strip() for line in f.readlines() if line.strip()]
+        tag_file = load_tag_file(file_path)
+        
+        # Apply filter if provided
+        if filter_text:
+            return tag_file.search(filter_text)
             
-            # Apply filter if provided
-            if filter_text:
-                filter_text = filter_text.lower()
-                tags = [tag for tag in tags if filter_text in tag.lower()]
-                
-            return tags
+        return list(tag_file.tags)
     except Exception as e:
         print(f"Error reading tags file {file_path}: {e}")
         return []
@@ -151,6 +173,10 @@ async def api_get_directory_structure(request):
         data = await request.json()
         path = data.get("path", "./")
         filter_text = data.get("filter", "")
+        try:
+            depth = parse_depth(data.get("depth"))
+        except (TypeError, ValueError):
+            return web.json_response({"error": "Invalid depth"}, status=400)
 
         if not os.path.isabs(path):
             path = os.path.abspath(path)
@@ -158,24 +184,48 @@ async def api_get_directory_structure(request):
         if not os.path.exists(path):
             return web.json_response({"error": "Path does not exist"}, status=400)
 
-        # If path is a file, get its directory
-        if os.path.isfile(path):
-            directory = os.path.dirname(path)
-            structure = get_directory_structure(directory)
-            tags = get_tags_from_file(path, filter_text)
-        else:
-            structure = get_directory_structure(path)
-            tags = []
-
-        response_data = {
-            "structure": structure,
-            "tags": tags
-        }
+        response_data = await run_blocking("tag_directory_structure", _get_tag_browser_data, path, filter_text, depth, key=(path, filter_text, depth))
         
-        return web.json_response(response_data)
+        return json_response_with_etag(request, response_data)
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+
+@PromptServer.instance.routes.get("/max_tag_browser/get_children")
+async def api_get_children(request):
+    # Expands one node of the directory tree: ?path=...&depth=1
+    try:
+        path = request.query.get("path", "./")
+        try:
+            depth = parse_depth(request.query.get("depth", "1"))
+        except ValueError:
+            return web.json_response({"error": "Invalid depth"}, status=400)
+
+        if not os.path.isabs(path):
+            path = os.path.abspath(path)
+
+        if not os.path.isdir(path):
+            return web.json_response({"error": "Directory does not exist"}, status=400)
+
+        structure = await run_blocking("tag_get_children", get_directory_structure, path, depth, key=(path, depth))
+        return json_response_with_etag(request, structure)
     except Exception as e:
         return web.json_response({"error": str(e)}, status=500)
 
+def _get_tag_browser_data(path, filter_text, depth=None):
+    # If path is a file, get its directory
+    if os.path.isfile(path):
+        directory = os.path.dirname(path)
+        structure = get_directory_structure(directory, depth)
+        tags = get_tags_from_file(path, filter_text)
+    else:
+        structure = get_directory_structure(path, depth)
+        tags = []
+
+    return {
+        "structure": structure,
+        "tags": tags
+    }
+
 @PromptServer.instance.routes.post("/max_tag_browser/get_file_info")
 async def get_file_info(request):
     try:
@@ -1,4 +1,5 @@
 import os
+from .MaxFile_Catalog import get_catalog
 
 root_dir = os.path.dirname(os.path.abspath(__file__))
 prompts_path = os.path.abspath(os.path.join(root_dir, "../prompts"))
@@ -9,12 +10,7 @@ class Max_Test:
 
         global prompts_path
         try:
-            prompt_dirs = []
-            for root, dirs, files in os.walk(prompts_path):
-                for d in dirs:
-                    full_path = os.path.join(root, d)
-                    rel_path = os.path.relpath(full_path, prompts_path)
-                    prompt_dirs.append(rel_path)
+            prompt_dirs = get_catalog(prompts_path).dirs()
         except Exception:
             prompt_dirs = []
 
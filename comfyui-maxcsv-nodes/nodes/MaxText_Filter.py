@@ -0,0 +1,170 @@
+import re
+import threading
+from collections import OrderedDict
+from .MaxMetrics import inc, cache_lookup, span
+
+# Term results kept per search scope
+RESULT_CACHE_SIZE = 64
+
+_TOKEN_RE = re.compile(r'(-)?(?:([^\s:"]+):)?(?:"([^"]*)"?|(\S+))')
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+def _bits_from_ids(ids):
+    if not ids:
+        return 0
+    data = bytearray((ids[-1] >> 3) + 1)
+    for i in ids:
+        data[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(data, "little")
+
+def ids_from_bits(bits):
+    """
+    Returns the sorted row ids set in a bitset.
+    """
+    ids = []
+    data = bits.to_bytes((bits.bit_length() + 7) >> 3, "little")
+    for byte_index, byte in enumerate(data):
+        if byte:
+            base = byte_index << 3
+            ids.extend(base + bit for bit in _BYTE_BITS[byte])
+    return ids
+
+def parse_filter(filter_text, columns):
+    """
+    Parses filter text into OR groups of AND terms: [[(negate, column, term), ...], ...]
+    Syntax:
+    - words: all must match (AND), "quoted text" matches as a whole
+    - OR or |: either side must match
+    - -word: must not match
+    - column:word: match only in that column (column names are case-insensitive)
+    """
+    groups = [[]]
+    for match in _TOKEN_RE.finditer(filter_text or ""):
+        negate, column, quoted, word = match.groups()
+        term = quoted if quoted is not None else word
+        if not negate and column is None and quoted is None and term in ("OR", "|"):
+            if groups[-1]:
+                groups.append([])
+            continue
+        column_index = None
+        if column is not None:
+            if column.lower() in columns:
+                column_index = columns.index(column.lower())
+            else:
+                # Not a column name, e.g. "http://..." - keep it as plain text
+                term = f"{column}:{term}"
+        term = term.lower()
+        if term:
+            groups[-1].append((bool(negate), column_index, term))
+    return [group for group in groups if group]
+
+def row_matcher(filter_text, columns):
+    """
+    Returns a function telling whether one row (list of cells) matches filter_text.
+    Same test as TextIndex.search, for readers that only see one row at a time.
+    """
+    groups = parse_filter(filter_text, [c.strip().lower() for c in columns])
+
+    def matches(row):
+        if not groups:
+            return True
+        text = None
+        for group in groups:
+            for negate, scope, term in group:
+                if scope is None:
+                    if text is None:
+                        text = "\x00".join(row).lower()
+                    found = term in text
+                else:
+                    found = scope < len(row) and term in row[scope].lower()
+                if found == negate:
+                    break
+            else:
+                return True
+        return False
+
+    return matches
+
+class TextIndex:
+    """
+    Case-insensitive filter over rows of text, built lazily and kept per file version.
+    rows: sequence of rows (lists of cells), or of plain strings for single-column data
+    Lowercased row text is built once per search scope (all columns or one column).
+    Term results are kept as row-id bitsets, and a new term only rescans rows
+    that matched a cached part of it, which is what happens while typing a filter.
+    """
+    def __init__(self, columns, rows):
+        self.columns = [c.strip().lower() for c in columns]
+        self.rows = rows
+        self.all_bits = (1 << len(rows)) - 1
+        self._haystacks = {}
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def _haystack(self, scope):
+        haystack = self._haystacks.get(scope)
+        if haystack is None:
+            if scope is None:
+                # Cells are joined with a character that can't be typed, so terms never span two cells
+                haystack = [(row if isinstance(row, str) else "\x00".join(row)).lower() for row in self.rows]
+            else:
+                haystack = []
+                for row in self.rows:
+                    if isinstance(row, str):
+                        row = [row]
+                    haystack.append(row[scope].lower() if scope < len(row) else "")
+            self._haystacks[scope] = haystack
+        return haystack
+
+    def _term_bits(self, scope, term):
+        results = self._results.setdefault(scope, OrderedDict())
+        cached = results.get(term)
+        cache_lookup("filter_terms", cached is not None)
+        if cached is not None:
+            results.move_to_end(term)
+            return cached[0]
+
+        haystack = self._haystack(scope)
+        base = None
+        for cached_term, cached_result in results.items():
+            if cached_term in term and (base is None or cached_result[1] < base[1]):
+                base = cached_result
+        if base is None:
+            ids = [i for i, text in enumerate(haystack) if term in text]
+            inc("rows_scanned_total", "filter", len(haystack))
+        else:
+            ids = [i for i in ids_from_bits(base[0]) if term in haystack[i]]
+            inc("rows_scanned_total", "filter", base[1])
+
+        bits = _bits_from_ids(ids)
+        results[term] = (bits, len(ids))
+        if len(results) > RESULT_CACHE_SIZE:
+            results.popitem(last=False)
+        return bits
+
+    def search_bits(self, filter_text):
+        """
+        Returns a bitset of the rows matching filter_text (see parse_filter).
+        """
+        groups = parse_filter(filter_text, self.columns)
+        if not groups:
+            return self.all_bits
+        result = 0
+        with self._lock, span("filter"):
+            for group in groups:
+                group_bits = self.all_bits
+                for negate, scope, term in group:
+                    bits = self._term_bits(scope, term)
+                    group_bits &= (self.all_bits & ~bits) if negate else bits
+                    if not group_bits:
+                        break
+                result |= group_bits
+        return result
+
+    def search(self, filter_text):
+        """
+        Returns the sorted ids of the rows matching filter_text.
+        """
+        if not (filter_text or "").strip():
+            return list(range(len(self.rows)))
+        return ids_from_bits(self.search_bits(filter_text))
@@ -0,0 +1,117 @@
+import random
+import string
+from functools import lru_cache
+from .MaxCSV_Row import EMPTY_ROW
+
+# Templates kept compiled
+TEMPLATE_CACHE_SIZE = 256
+# Rows a {name.column} field can read from, besides the row itself
+TEMPLATE_ROWS = ("row", "style")
+# Text sources a {name:selector} field can read from
+TEMPLATE_SOURCES = ("tag", "file")
+# Selectors of a text source, besides a line number (from 1)
+TEMPLATE_SELECTORS = ("random", "all", "text")
+
+_formatter = string.Formatter()
+
+class TextSource:
+    """
+    Text read by {name:selector} fields: the whole text and its non-empty lines.
+    """
+    __slots__ = ("text", "lines")
+
+    def __init__(self, text="", lines=None):
+        self.text = text
+        self.lines = lines if lines is not None else [line.strip() for line in text.splitlines() if line.strip()]
+
+EMPTY_SOURCE = TextSource()
+
+def _row_field(row_name, column):
+    key = column.strip().lower()
+    if row_name == "row":
+        return lambda row, style, sources, rng: row.get(key, "")
+    return lambda row, style, sources, rng: style.get(key, "")
+
+def _source_field(name, selector):
+    if selector == "random":
+        def field(row, style, sources, rng):
+            lines = sources.get(name, EMPTY_SOURCE).lines
+            return rng.choice(lines) if lines else ""
+        return field
+    if selector == "all":
+        return lambda row, style, sources, rng: ", ".join(sources.get(name, EMPTY_SOURCE).lines)
+    if selector == "text":
+        return lambda row, style, sources, rng: sources.get(name, EMPTY_SOURCE).text
+    if selector.isdigit() and int(selector) > 0:
+        line = int(selector) - 1
+        def field(row, style, sources, rng):
+            lines = sources.get(name, EMPTY_SOURCE).lines
+            return lines[line] if line < len(lines) else ""
+        return field
+    raise ValueError(f"Invalid template field '{{{name}:{selector}}}': use {', '.join(TEMPLATE_SELECTORS)} or a line number")
+
+class CompiledTemplate:
+    """
+    A template split once into its literal parts and fields; rendering only fills the fields in.
+    Fields: {column} or {row.column} (the row), {style.column} (the style row), and
+    {tag:selector} or {file:selector} (text sources), where selector is random, all (lines joined with ", "),
+    text (the whole text) or a line number. {{ and }} are literal braces.
+    sources: names of the text sources used. uses_random: a field picks a random line.
+    """
+    __slots__ = ("template", "sources", "uses_random", "_parts", "_fields")
+
+    def __init__(self, template):
+        self.template = template
+        self.sources = set()
+        self.uses_random = False
+        self._parts = []
+        # (position in _parts, field function)
+        self._fields = []
+        try:
+            parsed = list(_formatter.parse(template))
+        except ValueError as e:
+            raise ValueError(f"Invalid template: {e}") from None
+        for literal, name, selector, conversion in parsed:
+            if literal:
+                self._parts.append(literal)
+            if name is None:
+                continue
+            self._fields.append((len(self._parts), self._compile_field(name, selector, conversion)))
+            self._parts.append("")
+
+    def _compile_field(self, name, selector, conversion):
+        if conversion is not None:
+            raise ValueError(f"Invalid template field '{{{name}!{conversion}}}'")
+        if not name.strip():
+            raise ValueError("Invalid template field '{}': a column name is needed")
+        if selector:
+            source = name.strip().lower()
+            if source not in TEMPLATE_SOURCES:
+                raise ValueError(f"Invalid template field '{{{name}:{selector}}}': only {' and '.join(TEMPLATE_SOURCES)} take a selector")
+            selector = selector.strip().lower()
+            self.sources.add(source)
+            self.uses_random = self.uses_random or selector == "random"
+            return _source_field(source, selector)
+        row_name, dot, column = name.partition(".")
+        if dot and row_name.strip().lower() in TEMPLATE_ROWS:
+            return _row_field(row_name.strip().lower(), column)
+        return _row_field("row", name)
+
+    def render(self, row=EMPTY_ROW, style=EMPTY_ROW, sources=None, rng=random):
+        """
+        Returns the template filled from row and style (CSVRow) and sources ({name: TextSource}).
+        Missing columns and sources give an empty text.
+        """
+        if sources is None:
+            sources = {}
+        parts = list(self._parts)
+        for position, field in self._fields:
+            parts[position] = field(row, style, sources, rng)
+        return "".join(parts)
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(template):
+    """
+    Returns the CompiledTemplate of template, compiled once. Raises ValueError for invalid templates.
+    """
+    return CompiledTemplate(template)
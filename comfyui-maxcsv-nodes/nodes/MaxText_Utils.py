@@ -1,22 +1,145 @@
 import re
 import os
+import random
+from functools import lru_cache
 from server import PromptServer  # type: ignore # - server is a part of ComfyUI Core
 from aiohttp import web
+from .MaxCSV_Row import ROW_TYPE, EMPTY_ROW, parse_row_text
+from .MaxCSV_Cache import file_version
+from .MaxText_Template import TextSource, compile_template
+from .MaxTag_Loader import load_tag_file
+from .MaxPrompt_Cache import read_prompt_files
+from .MaxFile_Catalog import get_catalog
 
+root_dir = os.path.dirname(os.path.abspath(__file__))
+tags_path = os.path.abspath(os.path.join(root_dir, "../tags"))
+prompts_path = os.path.abspath(os.path.join(root_dir, "../prompts"))
+
+# Cleaned texts kept, the same prompts are beautified over and over in batch runs
+CLEAN_TEXT_CACHE_SIZE = 4096
+
+# One scan for the comma and space rules: a run of commas (with the spaces before them, and a period
+# right before them), or spaces and tabs to collapse. Line breaks are not spaces here.
+# The lookahead lets the scan skip letters with a single test.
+_COMMA_SPACE_RE = re.compile(r'(?=[.,\s])(?:(\.?)[^\S\n]*,(?:[^\S\n]*,)*|[ \t]{2,}|\t)')
+_BLANK_LINES_RE = re.compile(r'(\n\s*){3,}')
+_COMMA_BEFORE_WORD_RE = re.compile(r',(\S)')
+_WHITESPACE_RE = re.compile(r'\s+')
+# Find & replace settings kept compiled
+REPLACER_CACHE_SIZE = 64
+# Find & replace modes: plain text, regular expression, or a table of "old => new" lines
+REPLACE_MODES = ["plain", "regex", "mapping"]
+# Extracted texts kept per (text, header, extract_all)
+EXTRACT_CACHE_SIZE = 1024
+# Outputs of Max_Extract_Columns
+EXTRACT_MAX_COLUMNS = 8
+
+def _comma_space(match):
+    run = match.group(0)
+    if run[-1] != ',':
+        return ' ' # Replace multiple spaces with a single space, while keeping newlines
+    # Remove spaces before commas and duplicate commas, '.,' becomes '.'
+    # and a space is added after the comma if it's followed by a word or a line break
+    text, end = match.string, match.end()
+    spaced = end < len(text) and (text[end] == '\n' or not text[end].isspace())
+    return ('.' if match.group(1) else ',') + (' ' if spaced else '')
+
+@lru_cache(maxsize=CLEAN_TEXT_CACHE_SIZE)
 def clean_text(text):
-    text = re.sub(r'\n','####', text) # Replace line breaks to keep it for future (line breaks should not be deleted by default
-    text = re.sub(r'\s+,', ',', text) # Remove spaces before commas
-    text = re.sub(r',+', ',', text) # Remove duplicate commas
-    text = re.sub(r',(\S)', r', \1', text) # Add a space after a comma if it's followed by a word without space
-    text = re.sub(r'[ \t]+', ' ', text) # Replace multiple spaces with a single space, while keeping newlines
-    text = re.sub(r'\.,|,\.', '.', text) # Replace incorrect combinations like '.,' and ',.' with '.'
-    text = re.sub(r"####",'\n', text) # Return line breaks
-    text = re.sub(r'(\n\s*){3,}', '\n\n', text) # Consolidate three or more consecutive newlines into two
+    """
+    Beautifies prompt text: fixes spaces around commas and periods, removes duplicate commas and
+    collapses runs of spaces and of more than one empty line. Line breaks are kept.
+    """
+    if '#' in text:
+        text = text.replace('\n', '####').replace('####', '\n') # Text written as #### counts as a line break
+    text = _COMMA_SPACE_RE.sub(_comma_space, text)
+    if '\n' in text:
+        text = _BLANK_LINES_RE.sub('\n\n', text) # Consolidate three or more consecutive newlines into two
     text = text.strip().replace(" .", ".") # Remove spaces before periods
-    text = re.sub(r',(\S)', r' ', text) # Add a space after a comma if it's followed by a word without space
-    cleaned_lines = [line.lstrip("., ") for line in text.splitlines()] # Delete excess commas
-    text = "\n".join(cleaned_lines)
-    return text
+    if ',' in text:
+        text = _COMMA_BEFORE_WORD_RE.sub(' ', text) # A comma left before a word (", ." above) is dropped with that character
+    return "\n".join(line.lstrip("., ") for line in text.splitlines()) # Delete excess commas
+
+def _batch_size(*inputs):
+    # Number of runs for list inputs: the longest list, like ComfyUI without INPUT_IS_LIST
+    return max((len(values) for values in inputs), default=0)
+
+def _item(values, i):
+    # Item i of a list input, shorter lists repeat their last item
+    return values[min(i, len(values) - 1)] if values else None
+
+def _replace_mapping(table, default_replace):
+    pairs = {}
+    for line in table.splitlines():
+        if "=>" in line:
+            old, new = line.split("=>", 1)
+            old, new = old.strip(), new.strip()
+        else:
+            old, new = line.strip(), default_replace
+        if old:
+            pairs[old] = new
+    if not pairs:
+        return lambda text: text
+    # One alternation of every key, longest first, so the text is scanned once whatever the table size
+    pattern = re.compile("|".join(re.escape(old) for old in sorted(pairs, key=len, reverse=True)))
+    replace_match = lambda match: pairs[match.group(0)]
+    return lambda text: pattern.sub(replace_match, text)
+
+@lru_cache(maxsize=REPLACER_CACHE_SIZE)
+def get_replacer(mode, find, replace):
+    """
+    Returns a function applying one find & replace to a text, compiled once per settings.
+    Raises ValueError for an invalid regular expression or replacement.
+    """
+    if mode == "regex":
+        try:
+            pattern = re.compile(find)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression '{find}': {e}")
+        try:
+            # The replacement is parsed before any match, so an empty text checks its group references
+            pattern.sub(replace, "")
+        except (re.error, IndexError) as e:
+            raise ValueError(f"Invalid replacement '{replace}': {e}")
+        return lambda text: pattern.sub(replace, text)
+    if mode == "mapping":
+        return _replace_mapping(find, replace)
+    return lambda text: text.replace(find, replace)
+
+@lru_cache(maxsize=EXTRACT_CACHE_SIZE)
+def extract_lines(string, searchword, extract_all):
+    """
+    Returns the lines of string under the header searchword, or every line but the headers when extract_all is set.
+    """
+    if extract_all:
+        result = []
+        for line in string.splitlines():
+            stripped = line.strip()
+            if not stripped:
+                continue  # Skip empty lines
+            if stripped.endswith(":") and len(stripped.split()) == 1:
+                continue  # Skip headers
+            result.append(line)
+        return "\n".join(result)
+
+    searchword = searchword.lower()
+    collect = False
+    lines_out = []
+
+    for line in string.splitlines():
+        if not collect:
+            # Detect header line
+            header = line.strip()
+            if header.lower().rstrip(':') == searchword:
+                collect = True
+            continue
+
+        # Stop on first empty line
+        if line.strip() == "":
+            break
+        lines_out.append(line)
+
+    return "\n".join(lines_out)
 
 class AnyType(str):
     def __ne__(self, __value: object) -> bool:
@@ -55,6 +178,8 @@ class Max_Extract_Prompt:
         }
 
     RETURN_TYPES = ("STRING",)
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True,)
     FUNCTION = "extract_prompt"
     CATEGORY = "Max NODES"
     DESCRIPTION = """
@@ -63,39 +188,44 @@ Extracts full lines of text from input text based on the header provided in inpu
 If "extract_all" is set ot true, node will return the original text with all headers removed
 
 Use with EZ_CSV_Loader to extract text content based on header name
+A list of texts (e.g. BATCH_SELECTED) is processed in a single run
 """
 
     def extract_prompt(self, string, searchword, extract_all):
-        if extract_all:
-            result = []
-            for line in string.splitlines():
-                stripped = line.strip()
-                if not stripped:
-                    continue  # Skip empty lines
-                if stripped.endswith(":") and len(stripped.split()) == 1:
-                    continue  # Skip headers
-                result.append(line)
-            return ("\n".join(result),)
-
-        searchword = searchword.lower()
-        collect = False
-        lines_out = []
+        count = _batch_size(string, searchword, extract_all)
+        return ([extract_lines(_item(string, i), _item(searchword, i), _item(extract_all, i)) for i in range(count)],)
+
+class Max_Extract_Columns:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "columns": ("STRING", {"multiline": False, "default": "prompt, filename"}),
+            },
+            "optional": {
+                "row": (ROW_TYPE,),
+                "text": ("STRING", {"multiline": True, "default": "", "forceInput": True}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING",) * EXTRACT_MAX_COLUMNS
+    RETURN_NAMES = tuple(f"value_{i}" for i in range(1, EXTRACT_MAX_COLUMNS + 1))
+    FUNCTION = "extract_columns"
+    CATEGORY = "Max NODES"
+    DESCRIPTION = """
+Outputs the values of up to 8 columns of a CSV row at once, in the order of "columns" (comma-separated, case-insensitive)
+
+Connect the ROW output of a CSV loader, or a loader text (STRING / BATCH_SELECTED) to "text"
+Missing columns output an empty text
+"""
+
+    def extract_columns(self, columns, row=None, text=None):
+        if row is None:
+            row = parse_row_text(text or "")
+        names = [name.strip() for name in columns.split(",")][:EXTRACT_MAX_COLUMNS]
+        values = [row.get(name, "") if name else "" for name in names]
+        return tuple(values + [""] * (EXTRACT_MAX_COLUMNS - len(values)))
 
-        for line in string.splitlines():
-            if not collect:
-                # Detect header line
-                header = line.strip()
-                if header.lower().rstrip(':') == searchword:
-                    collect = True
-                continue
-
-            # Stop on first empty line
-            if line.strip() == "":
-                break
-            lines_out.append(line)
-
-        return ("\n".join(lines_out),)
-        
 class Max_Find_Replace:
     @classmethod
     def INPUT_TYPES(cls):
@@ -104,21 +234,35 @@ class Max_Find_Replace:
                 "string": ("STRING", {"multiline": True, "default": "", "forceInput": True}),
             },
             "optional": {
-                "find": ("STRING", {"multiline": False, "default": ""}),
+                "find": ("STRING", {"multiline": True, "default": ""}),
                 "replace": ("STRING", {"multiline": False, "default": ""}),
+                "mode": (REPLACE_MODES, {"default": "plain"}),
             },
         }
 
     RETURN_TYPES = ("STRING",)
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True,)
     FUNCTION = "find_replace"
     CATEGORY = "Max NODES"
     DESCRIPTION = """
 Finds and replaces all instances of text string
+
+mode:
+- plain: replaces the find text
+- regex: find is a regular expression, replace can use groups (\\1)
+- mapping: find is a table with one "old => new" per line, all replaced in a single pass (lines without "=>" are replaced with replace)
+
+A list of texts (e.g. BATCH_SELECTED) is processed in a single run
 """
 
-    def find_replace(self, string, find, replace):
-        string = string.replace(find, replace)
-        return (string,)
+    def find_replace(self, string, find=None, replace=None, mode=None):
+        find, replace, mode = find or [""], replace or [""], mode or ["plain"]
+        results = []
+        for i in range(_batch_size(string, find, replace, mode)):
+            replacer = get_replacer(_item(mode, i), _item(find, i), _item(replace, i))
+            results.append(replacer(_item(string, i)))
+        return (results,)
 
 class Max_Text_Concat: # inspired by WAS-Suite by Jordan Thompson (WASasquatch) and Bjornulf nodes
 
@@ -137,33 +281,152 @@ class Max_Text_Concat: # inspired by WAS-Suite by Jordan Thompson (WASasquatch)
         }
 
     RETURN_TYPES = ("STRING",)
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True,)
     FUNCTION = "text_concatenate"
     CATEGORY = "Max NODES"
     DESCRIPTION = """
 Concatenate any number of string inputs into a single string with options to beatify text before or after concatenation
 
 use single or multiple "\\n" inputs as delimiter to add line breaks
+Lists of texts (e.g. BATCH_SELECTED) are concatenated item by item in a single run
 """
 
     def text_concatenate(self, delimiter, beautify, line_breaks, number_of_inputs, **kwargs):
-        text_inputs = [] 
-        delimiter=delimiter.replace("\\n","\n")
-        for k in sorted(kwargs.keys()):
-            v = kwargs[k]
-            if isinstance(v, str):
-                if beautify == "before":
-                        v=clean_text(v)
-                if v != "":
-                    text_inputs.append(v)
-        merged_text = delimiter.join(text_inputs)
-        print(merged_text)
-        if beautify == "after":
-            merged_text = clean_text(merged_text)
-        if line_breaks == "delete":
-            merged_text = re.sub(r'\n',' ', merged_text)
-            merged_text = re.sub(r'\s+', ' ', merged_text)
-        return (merged_text,)
+        texts = [kwargs[k] for k in sorted(kwargs.keys())]
+        results = []
+        for i in range(_batch_size(delimiter, beautify, line_breaks, *texts)):
+            item_beautify = _item(beautify, i)
+            text_inputs = []
+            for values in texts:
+                v = _item(values, i)
+                if isinstance(v, str):
+                    if item_beautify == "before":
+                        v = clean_text(v)
+                    if v != "":
+                        text_inputs.append(v)
+            merged_text = _item(delimiter, i).replace("\\n", "\n").join(text_inputs)
+            if item_beautify == "after":
+                merged_text = clean_text(merged_text)
+            if _item(line_breaks, i) == "delete":
+                merged_text = _WHITESPACE_RE.sub(' ', merged_text) # Line breaks and runs of spaces become one space
+            results.append(merged_text)
+        return (results,)
     
+def _template_file(directory, name):
+    # Full path of a file picked in a Max_Template list, None for "none"
+    return os.path.abspath(os.path.join(directory, name)) if name and name != "none" else None
+
+def _template_source(kind, path):
+    # TextSource of a tag file or a prompt file, empty when missing
+    if path is None or not os.path.isfile(path):
+        return TextSource()
+    if kind == "tag":
+        tags = load_tag_file(path).tags
+        return TextSource("\n".join(tags), tags)
+    texts = read_prompt_files(os.path.dirname(path), [os.path.basename(path)])
+    return TextSource(texts[0].strip() if texts else "")
+
+class Max_Template:
+    @classmethod
+    def INPUT_TYPES(cls):
+        global tags_path, prompts_path
+        try:
+            tag_files = get_catalog(tags_path).files('.txt')
+        except Exception:
+            tag_files = []
+        try:
+            prompt_files = get_catalog(prompts_path).files('.txt')
+        except Exception:
+            prompt_files = []
+
+        return {
+            "required": {
+                "template": ("STRING", {"multiline": True, "default": "{prompt}, {style.prompt}, {tag:random}"}),
+            },
+            "optional": {
+                "row": (ROW_TYPE,),
+                "style": (ROW_TYPE,),
+                "text": ("STRING", {"multiline": True, "default": "", "forceInput": True}),
+                "tags_file": (["none"] + tag_files, {"default": "none"}),
+                "prompt_file": (["none"] + prompt_files, {"default": "none"}),
+                "beautify": ("BOOLEAN", {"default": True}),
+                "seed": ("INT", {"default": -1, "min": -1, "max": 0xffffffffffffffff}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING",)
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True,)
+    FUNCTION = "render_template"
+    CATEGORY = "Max NODES"
+    DESCRIPTION = """
+Builds a prompt from a template, replacing Concatenate + Find & Replace chains with a single node
+Fields:
+- {column} or {row.column}: a column of the ROW (or of a loader text connected to "text"), case-insensitive
+- {style.column}: a column of the style ROW, e.g. a second CSV loader or Max CSV Lookup
+- {tag:random}, {tag:all}, {tag:3}: a random tag, all tags (comma-separated) or tag number 3 of tags_file
+- {file:text}, {file:random}, {file:all}, {file:3}: the prompt_file, whole or by line
+{{ and }} are literal braces; missing columns are empty
+beautify cleans the result (commas and spaces left by empty fields)
+With a seed (0 or more) random fields are reproducible; the seed increases by one for each row
+
+A list of rows (e.g. the ROW output of a CSV loader) is rendered in a single run, one text per row
+The template is compiled once and reused for every row and run
+"""
+
+    def render_template(self, template, row=None, style=None, text=None, tags_file=None, prompt_file=None, beautify=None, seed=None):
+        row, style, text = row or [], style or [EMPTY_ROW], text or []
+        tags_file, prompt_file = tags_file or ["none"], prompt_file or ["none"]
+        beautify, seed = beautify or [True], seed or [-1]
+        # Each file is read once per run, whatever the number of rows
+        sources = {}
+        results = []
+        for i in range(_batch_size(template, row, style, text, tags_file, prompt_file, beautify, seed)):
+            compiled = compile_template(_item(template, i))
+            item_row = _item(row, i) if row else parse_row_text(_item(text, i) or "")
+            files = (("tag", _template_file(tags_path, _item(tags_file, i))), ("file", _template_file(prompts_path, _item(prompt_file, i))))
+            item_sources = {}
+            for kind, path in files:
+                if kind in compiled.sources:
+                    if (kind, path) not in sources:
+                        sources[(kind, path)] = _template_source(kind, path)
+                    item_sources[kind] = sources[(kind, path)]
+            item_seed = _item(seed, i)
+            rng = random.Random(item_seed + i) if item_seed is not None and item_seed >= 0 else random
+            result = compiled.render(item_row, _item(style, i), item_sources, rng)
+            results.append(clean_text(result) if _item(beautify, i) else result)
+        return (results,)
+
+    @classmethod
+    def VALIDATE_INPUTS(cls, template):
+        for item in (template if isinstance(template, list) else [template]):
+            try:
+                compile_template(item)
+            except ValueError as e:
+                return str(e)
+        return True
+
+    @classmethod
+    def IS_CHANGED(cls, template, row=None, style=None, text=None, tags_file=None, prompt_file=None, beautify=None, seed=None):
+        # Random fields without a seed give a new prompt on every run, otherwise only file changes matter
+        templates = template if isinstance(template, list) else [template]
+        seeds = seed if isinstance(seed, list) else [seed]
+        # Lists instead of any(): the name is the AnyType instance in this module
+        unseeded = [s for s in seeds if s is None or s < 0]
+        try:
+            if unseeded and [item for item in templates if compile_template(item).uses_random]:
+                return float('nan')
+        except ValueError:
+            return float('nan')
+        versions = []
+        for directory, names in ((tags_path, tags_file), (prompts_path, prompt_file)):
+            for name in (names if isinstance(names, list) else [names]):
+                path = _template_file(directory, name)
+                if path is not None and os.path.isfile(path):
+                    versions.append(str(file_version(path)))
+        return ":".join(versions)
+
 class Max_Text_to_Size:
 
     @classmethod
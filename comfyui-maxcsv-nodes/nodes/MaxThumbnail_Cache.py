@@ -0,0 +1,183 @@
+import os
+import io
+import base64
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+root_dir = os.path.dirname(os.path.abspath(__file__))
+thumbnail_cache_path = os.path.abspath(os.path.join(root_dir, "../.cache/thumbnails"))
+
+THUMBNAIL_SIZE = (80, 80)
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_CONTENT_TYPE = "image/webp"
+# Total size of encoded thumbnails kept in memory
+THUMBNAIL_MEMORY_MAX_BYTES = 32 * 1024 * 1024
+# Total size of thumbnail files kept in the disk cache, least recently used ones are deleted past it
+THUMBNAIL_DISK_MAX_BYTES = 256 * 1024 * 1024
+# Share of the disk budget left once pruned, so pruning doesn't run again on the next write
+THUMBNAIL_DISK_PRUNE_TO = 0.8
+# Threads generating thumbnails for batch requests
+THUMBNAIL_WORKERS = 4
+# Image files looked up for a prompt file, in order
+THUMBNAIL_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+_memory_cache = OrderedDict()
+_memory_bytes = 0
+_memory_lock = threading.Lock()
+# Bytes in the disk cache, counted on the first write
+_disk_bytes = None
+_disk_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+def _cache_key(full_path):
+    st = os.stat(full_path)
+    key = f"{os.path.abspath(full_path)}:{st.st_mtime_ns}:{st.st_size}:{THUMBNAIL_SIZE}:{THUMBNAIL_FORMAT}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def _remember(key, data):
+    global _memory_bytes
+    with _memory_lock:
+        if key in _memory_cache:
+            return
+        _memory_cache[key] = data
+        _memory_bytes += len(data)
+        while _memory_bytes > THUMBNAIL_MEMORY_MAX_BYTES and _memory_cache:
+            _, old = _memory_cache.popitem(last=False)
+            _memory_bytes -= len(old)
+
+def _disk_files():
+    # [(last used, size, path)] of the thumbnail files; the modification time is refreshed on every read
+    files = []
+    for directory, _, names in os.walk(thumbnail_cache_path):
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+    return files
+
+def _prune_disk():
+    # Deletes the least recently used thumbnails down to THUMBNAIL_DISK_PRUNE_TO of the budget
+    global _disk_bytes
+    files = sorted(_disk_files())
+    total = sum(size for _, size, _ in files)
+    for _, size, path in files:
+        if total <= THUMBNAIL_DISK_MAX_BYTES * THUMBNAIL_DISK_PRUNE_TO:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+    _disk_bytes = total
+
+def _added_to_disk(size):
+    global _disk_bytes
+    with _disk_lock:
+        if _disk_bytes is None:
+            # Files of earlier runs and of other ComfyUI instances sharing the folder
+            _disk_bytes = sum(size for _, size, _ in _disk_files())
+        else:
+            _disk_bytes += size
+        if _disk_bytes > THUMBNAIL_DISK_MAX_BYTES:
+            _prune_disk()
+
+def _render(full_path):
+    # PIL is imported on the first thumbnail rather than at ComfyUI startup
+    from PIL import Image
+    with Image.open(full_path) as img:
+        # Lets the JPEG decoder skip straight to a reduced size
+        img.draft("RGB", (THUMBNAIL_SIZE[0] * 2, THUMBNAIL_SIZE[1] * 2))
+        img.thumbnail(THUMBNAIL_SIZE)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA")
+        buf = io.BytesIO()
+        img.save(buf, format=THUMBNAIL_FORMAT)
+        return buf.getvalue()
+
+def get_thumbnail(full_path):
+    """
+    Returns (thumbnail bytes, cache key) for an image file.
+    Thumbnails are cached in memory and on disk, keyed on path, mtime and size.
+    Both tiers have a byte budget and drop the least recently used thumbnails past it.
+    """
+    key = _cache_key(full_path)
+    with _memory_lock:
+        data = _memory_cache.get(key)
+        if data is not None:
+            _memory_cache.move_to_end(key)
+            return data, key
+
+    disk_path = os.path.join(thumbnail_cache_path, key[:2], key + "." + THUMBNAIL_FORMAT.lower())
+    try:
+        with open(disk_path, "rb") as f:
+            data = f.read()
+        try:
+            # Access times are often not kept up to date, the modification time tells what was used last
+            os.utime(disk_path)
+        except OSError:
+            pass
+    except OSError:
+        data = _render(full_path)
+        try:
+            os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(disk_path))
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, disk_path)
+            except BaseException:
+                # A partial file would stay in the cache folder, unseen by the disk budget
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+            _added_to_disk(len(data))
+        except OSError as e:
+            print(f"MaxThumbnail_Cache: Could not write thumbnail cache. Error: {e}")
+
+    _remember(key, data)
+    return data, key
+
+def find_thumbnail_image(directory, file):
+    """
+    Returns the image shown for a prompt file (same name, image extension), or None.
+    """
+    base_name = os.path.splitext(file)[0]
+    for extension in THUMBNAIL_EXTENSIONS:
+        image_path = os.path.join(directory, base_name + extension)
+        if os.path.isfile(image_path):
+            return image_path
+    return None
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="max_nodes_thumbnails")
+        return _pool
+
+def _thumbnail_data_url(directory, file):
+    image_path = find_thumbnail_image(directory, file)
+    if image_path is None:
+        return None
+    try:
+        data, _ = get_thumbnail(image_path)
+    except Exception as e:
+        print(f"MaxThumbnail_Cache: Could not create thumbnail for {image_path}. Error: {e}")
+        return None
+    return f"data:{THUMBNAIL_CONTENT_TYPE};base64," + base64.b64encode(data).decode("ascii")
+
+def get_thumbnails(directory, files):
+    """
+    Returns {file: thumbnail data URL} for the prompt files that have an image.
+    """
+    urls = _get_pool().map(lambda file: _thumbnail_data_url(directory, file), files)
+    return {file: url for file, url in zip(files, urls) if url is not None}
@@ -0,0 +1,10 @@
+import os
+import pytest
+
+PACK_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collect_directory(path, parent):
+    # The pack root is a package only ComfyUI can import: collect it as a plain directory
+    if os.path.abspath(str(path)) == PACK_DIR:
+        return pytest.Dir.from_parent(parent, path=path)
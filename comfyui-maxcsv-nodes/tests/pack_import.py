@@ -0,0 +1,36 @@
+"""
+Imports the node pack for the tests, without a ComfyUI server.
+"""
+import importlib.util
+import os
+import sys
+import types
+
+PACK_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# Name the pack is imported under, its modules are maxcsv_nodes.nodes.<module>
+PACK_NAME = "maxcsv_nodes"
+
+def import_pack():
+    # The nodes register their routes on PromptServer.instance.routes at import time
+    if "server" not in sys.modules:
+        from aiohttp import web
+        server = types.ModuleType("server")
+
+        class PromptServer:
+            instance = types.SimpleNamespace(routes=web.RouteTableDef())
+
+        server.PromptServer = PromptServer
+        sys.modules["server"] = server
+    if PACK_NAME not in sys.modules:
+        spec = importlib.util.spec_from_file_location(PACK_NAME, os.path.join(PACK_DIR, "__init__.py"), submodule_search_locations=[PACK_DIR])
+        pack = importlib.util.module_from_spec(spec)
+        sys.modules[PACK_NAME] = pack
+        spec.loader.exec_module(pack)
+    return sys.modules[PACK_NAME]
+
+def pack_module(name):
+    """
+    Returns the module nodes/<name>.py of the pack.
+    """
+    import_pack()
+    return sys.modules[f"{PACK_NAME}.nodes.{name}"]
@@ -0,0 +1,31 @@
+"""
+Golden-output test of clean_text.
+
+clean_text_corpus.json holds hand-typed prompts, comma, space and period edge cases and cells of the
+example CSV files, with the output of the original regex-chain clean_text. The single-scan version
+must give the same text for every entry.
+
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+import json
+import os
+import unittest
+from pack_import import pack_module
+
+CORPUS_FILE = os.path.join(os.path.dirname(__file__), "clean_text_corpus.json")
+
+class CleanTextGoldenTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.clean_text = staticmethod(pack_module("MaxText_Utils").clean_text)
+        with open(CORPUS_FILE, encoding="utf-8") as f:
+            cls.corpus = json.load(f)
+
+    def test_corpus(self):
+        for case in self.corpus:
+            with self.subTest(text=case["input"]):
+                self.assertEqual(self.clean_text(case["input"]), case["expected"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Resume cursors (MaxCSV_Cursor): claims, done records, claim timeouts and the cursor file read back.
+
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from pack_import import pack_module
+
+class CursorTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cursor = pack_module("MaxCSV_Cursor")
+        cls.cache = pack_module("MaxCSV_Cache")
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="maxcsv_cursor_test_")
+        self.csv_file = os.path.join(self.directory, "rows.csv")
+        self.write_csv("filename,prompt\na.png,one\nb.png,two\nc.png,three\n")
+
+    def tearDown(self):
+        self.cursor._states.pop(self.cursor.cursor_path(self.csv_file), None)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write_csv(self, text):
+        with open(self.csv_file, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def keys(self):
+        table = self.cache.load_csv_table(self.csv_file)
+        return self.cursor.table_row_keys(table, range(len(table.rows)))
+
+    def claim(self, keys, cursor="test", timeout=0):
+        position = self.cursor.claim_next(self.csv_file, cursor, keys, timeout)
+        return None if position is None else keys.keys[position]
+
+    def records(self):
+        with open(self.cursor.cursor_path(self.csv_file), encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def forget_process_state(self):
+        # As after a restart: claims and read offset are read again from the cursor file
+        self.cursor._states.clear()
+
+    def test_claims_return_different_rows(self):
+        keys = self.keys()
+        self.assertEqual([self.claim(keys) for _ in range(4)], ["a.png", "b.png", "c.png", None])
+        self.assertEqual([(r["key"], r["state"]) for r in self.records()], [("a.png", "claimed"), ("b.png", "claimed"), ("c.png", "claimed")])
+
+    def test_cursors_are_independent(self):
+        keys = self.keys()
+        self.assertEqual(self.claim(keys, "first"), "a.png")
+        self.assertEqual(self.claim(keys, "second"), "a.png")
+        self.assertEqual(self.claim(keys, "first"), "b.png")
+
+    def test_stale_claim_is_claimed_again(self):
+        keys = self.keys()
+        self.assertEqual(self.claim(keys, timeout=0.2), "a.png")
+        self.assertEqual(self.claim(keys, timeout=0.2), "b.png")
+        self.cursor.mark_done(self.csv_file, "test", "b.png")
+        time.sleep(0.3)
+        # a.png was never done, b.png was
+        self.assertEqual(self.claim(keys, timeout=0.2), "a.png")
+        self.assertEqual(self.claim(keys, timeout=0.2), "c.png")
+        self.assertIsNone(self.claim(keys, timeout=0.2))
+
+    def test_claims_are_final_without_timeout(self):
+        keys = self.keys()
+        self.assertEqual(self.claim(keys), "a.png")
+        time.sleep(0.1)
+        self.assertEqual(self.claim(keys), "b.png")
+
+    def test_legacy_records_are_done(self):
+        with open(self.cursor.cursor_path(self.csv_file), "w", encoding="utf-8") as f:
+            f.write(json.dumps({"cursor": "test", "key": "a.png", "time": 0}) + "\n")
+        keys = self.keys()
+        # Even a timeout doesn't bring back a row recorded before claims were tracked
+        self.assertEqual(self.claim(keys, timeout=0.01), "b.png")
+        time.sleep(0.05)
+        self.assertEqual(self.claim(keys, timeout=0.01), "b.png")
+
+    def test_duplicate_filenames_are_claimed_by_row(self):
+        self.write_csv("filename,prompt\na.png,one\na.png,two\n,three\na.png,four\n")
+        keys = self.keys()
+        self.assertEqual(keys.keys, ["a.png", "#1", "#2", "#3"])
+        self.assertEqual([self.claim(keys) for _ in range(5)], ["a.png", "#1", "#2", "#3", None])
+
+    def test_resume_after_restart(self):
+        keys = self.keys()
+        self.assertEqual(self.claim(keys, timeout=60), "a.png")
+        self.assertEqual(self.claim(keys, timeout=60), "b.png")
+        self.cursor.mark_done(self.csv_file, "test", "a.png")
+        self.forget_process_state()
+        self.assertEqual(self.claim(self.keys(), timeout=60), "c.png")
+        self.assertIsNone(self.claim(self.keys(), timeout=60))
+
+    def test_incomplete_line_is_read_once_completed(self):
+        keys = self.keys()
+        self.assertEqual(self.claim(keys), "a.png")
+        # A line cut short, e.g. by a crash of another process while writing
+        with open(self.cursor.cursor_path(self.csv_file), "a", encoding="utf-8") as f:
+            f.write('{"cursor": "test", "key": "b.p')
+        self.assertEqual(self.claim(keys), "b.png")
+        self.forget_process_state()
+        self.assertEqual(self.claim(self.keys()), "c.png")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+The row index (MaxCSV_Index) must find the same rows as parsing the whole file (MaxCSV_Cache._parse_csv),
+since the loader reads a file through either of them depending on the selection type.
+
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from pack_import import pack_module
+
+# name: file content (bytes), written to a temporary CSV file
+CASES = {
+    "quoted multi-line cells": b'filename,prompt\nimg1,"first line\nsecond line"\nimg2,"a ""quoted"" word, and\n\nmore"\nimg3,plain\n',
+    "stray quote": b'filename,prompt\nimg1,TV 5" screen\nimg2,second\nimg3,third',
+    "stray quotes after a quoted cell": b'filename,prompt\n"img1"x",a "b" c\nimg2,"ok"\nimg3,last "\n',
+    "crlf": b'filename,prompt\r\nimg1,"one\r\ntwo"\r\nimg2,three\r\n',
+    "cr only": b'filename,prompt\rimg1,one\rimg2,"two\rlines"\rimg3,three\r',
+    "blank-quoted records": b'filename,prompt\n"",""\nimg1,one\n" ", \n,\n"\n",""\nimg2,two\n',
+    "spaces before quotes": b'filename; prompt\nimg1; "a;\nb"\nimg2; c\n',
+    "semicolons and no final newline": b'filename;prompt\nimg1;"x;y"\nimg2;z',
+    "unicode": 'filename,prompt\nimg1,"café \nnaïve"\n , \nimg2,☃\n'.encode("utf-8"),
+    "utf-8 bom": b'\xef\xbb\xbffilename,prompt\nimg1,"a\nb"\nimg2,c\n',
+}
+
+class CSVRowIndexTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cache = pack_module("MaxCSV_Cache")
+        cls.index = pack_module("MaxCSV_Index")
+        cls.directory = tempfile.mkdtemp(prefix="maxcsv_index_test_")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def test_rows_match_parsed_table(self):
+        for number, (name, content) in enumerate(CASES.items()):
+            with self.subTest(case=name):
+                path = os.path.join(self.directory, f"case_{number}.csv")
+                with open(path, "wb") as f:
+                    f.write(content)
+                version = self.cache.file_version(path)
+                table = self.cache._parse_csv(version)
+                self.assertTrue(self.index.can_index(path))
+                index = self.index.get_row_index(path)
+                self.assertEqual(index.headers, table.headers)
+                self.assertEqual([index[i] for i in range(len(index))], [list(row) for row in table.rows])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Filter text (MaxText_Filter): TextIndex, used for loaded tables, and row_matcher, used for streamed files,
+must select the same rows.
+
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+import unittest
+from pack_import import pack_module
+
+COLUMNS = ["filename", "Prompt", "category"]
+ROWS = [
+    ["cat_01.png", "A cat on a red sofa", "photo"],
+    ["dog_02.png", "a dog in the park, night", "photo"],
+    ["castle.png", "Castle at night, dragon", "art"],
+    ["city.png", "neon city in the rain", "3d"],
+    ["forest.png", "forest at dawn", "art"],
+    ["http.png", "see http://example.com", "web"],
+    ["short.png", "red"],
+    ["empty.png", "", ""],
+]
+
+# filter text: ids of the matching rows
+CASES = {
+    "": [0, 1, 2, 3, 4, 5, 6, 7],
+    "   ": [0, 1, 2, 3, 4, 5, 6, 7],
+    "cat": [0],
+    "CAT": [0],
+    "night": [1, 2],
+    "png": [0, 1, 2, 3, 4, 5, 6, 7],
+    "night dragon": [2],
+    "red sofa": [0],
+    "night | rain": [1, 2, 3],
+    "night OR rain": [1, 2, 3],
+    "cat OR dog OR forest": [0, 1, 4],
+    "OR cat": [0],
+    "cat OR": [0],
+    "or": [4, 6],
+    '"red sofa"': [0],
+    '"sofa red"': [],
+    '"at night"': [2],
+    '"unclosed quote': [],
+    "night -dragon": [1],
+    "-photo": [2, 3, 4, 5, 6, 7],
+    "-png": [],
+    "category:art": [2, 4],
+    "CATEGORY:ART": [2, 4],
+    "prompt:red": [0, 6],
+    "filename:red": [],
+    "category:photo -prompt:dog": [0],
+    "-category:art night": [1],
+    "http://example.com": [5],
+    "nocolumn:word": [],
+    "category:art OR prompt:neon": [2, 3, 4],
+    # Cells are joined with a character that can't be typed: a term never spans two cells
+    "sofa photo": [0],
+    "png a cat": [0],
+    "zzz": [],
+}
+
+def old_substring_filter(filter_text, rows):
+    # The filter before the search syntax: one text, searched in every cell
+    return [i for i, row in enumerate(rows) if any(filter_text.lower() in str(cell).lower() for cell in row)]
+
+class TextFilterTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.filter = pack_module("MaxText_Filter")
+
+    def streamed(self, filter_text):
+        matches = self.filter.row_matcher(filter_text, COLUMNS)
+        return [i for i, row in enumerate(ROWS) if matches(row)]
+
+    def test_cases(self):
+        # One index for all cases, as while typing, and a new one per case
+        shared = self.filter.TextIndex(COLUMNS, ROWS)
+        for filter_text, expected in CASES.items():
+            with self.subTest(filter=filter_text):
+                self.assertEqual(shared.search(filter_text), expected)
+                self.assertEqual(self.filter.TextIndex(COLUMNS, ROWS).search(filter_text), expected)
+                self.assertEqual(self.streamed(filter_text), expected)
+
+    def test_single_word_matches_old_filter(self):
+        index = self.filter.TextIndex(COLUMNS, ROWS)
+        for word in ["cat", "Night", "a", "png", "red", "e", "city.png", "://", "zzz"]:
+            with self.subTest(word=word):
+                expected = old_substring_filter(word, ROWS)
+                self.assertEqual(index.search(word), expected)
+                self.assertEqual(self.streamed(word), expected)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -51,6 +51,7 @@ async function addCSVBrowserUI(node) {
     const SELECTION_BORDER_PADDING = 0;
     const ELLIPSIS = "...";
     const HEADERS_LINE_HEIGHT = 12; // Adjustable line height for headers preview
+    const PAGE_SIZE = 200; // Rows fetched per request
 
     const COLORS = {
         background: "#1e1e1e",
@@ -70,20 +71,27 @@ async function addCSVBrowserUI(node) {
     let filterText = filterTextWidget.value;
     let selectedRows = new Set();
     let headers = [];
-    let rows = [];
+    let totalRows = 0;
+    let rowCache = new Map(); // row index -> row, filled page by page while scrolling
+    let pendingPages = new Set();
+    let requestId = 0; // discards pages of a previous file or filter
     let scrollOffset = 0;
     let isDragging = false;
     let scrollStartY = 0;
     let scrollStartOffset = 0;
 
-    async function updateRows() {
+    async function fetchPage(page) {
+        const pageRequestId = requestId;
+        pendingPages.add(page);
         try {
-            const response = await fetch('/max_csv_browser/get_directory_structure', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ path: currentFile, filter: filterText })
+            const params = new URLSearchParams({
+                csv_file: csvFileWidget.value,
+                offset: page * PAGE_SIZE,
+                limit: PAGE_SIZE,
+                filter: filterText || ""
             });
-            
+            const response = await fetch(`/max_csv_browser/get_rows?${params}`);
+
             if (!response.ok) {
                 const errorData = await response.json();
                 console.error("Server error:", errorData.error);
@@ -95,15 +103,43 @@ async function addCSVBrowserUI(node) {
                 console.error("Invalid response format:", data);
                 return;
             }
+            if (pageRequestId !== requestId) {
+                return;
+            }
 
             headers = data.headers || [];
-            rows = data.rows || [];
+            totalRows = data.total || 0;
+            data.rows.forEach((row, i) => rowCache.set(data.offset + i, row));
             node.setDirtyCanvas(true);
         } catch (error) {
             console.error("Error updating rows:", error);
+        } finally {
+            if (pageRequestId === requestId) {
+                pendingPages.delete(page);
+            }
         }
     }
 
+    function getRow(rowIndex) {
+        const row = rowCache.get(rowIndex);
+        if (row === undefined) {
+            const page = Math.floor(rowIndex / PAGE_SIZE);
+            if (!pendingPages.has(page)) {
+                fetchPage(page);
+            }
+        }
+        return row;
+    }
+
+    async function updateRows() {
+        requestId++;
+        rowCache = new Map();
+        pendingPages = new Set();
+        totalRows = 0;
+        scrollOffset = 0;
+        await fetchPage(0);
+    }
+
     async function fetchFileInfo(relativePath) {
         try {
             const response = await fetch('/max_csv_browser/get_file_info', {
@@ -206,15 +242,20 @@ async function addCSVBrowserUI(node) {
         const maxWidth = node.size[0] - PREVIEW_PADDING * 2;
         let displayText = "";
         if (selectionTypeWidget.value === "random") {
-            const rowCount = selectedRows.size > 0 ? selectedRows.size : rows.length;
+            const rowCount = selectedRows.size > 0 ? selectedRows.size : totalRows;
             displayText = `selecting from ${rowCount} rows`;
         } else if (selectionTypeWidget.value === "multiple") {
             displayText = `${selectedRows.size} rows selected`;
+        } else if (selectionTypeWidget.value === "range") {
+            const start = node.widgets.find(w => w.name === "iteration_index")?.value ?? 0;
+            const count = node.widgets.find(w => w.name === "range_count")?.value ?? 1;
+            displayText = `${count} rows from row ${start + 1} of ${totalRows}`;
         } else if (selectionTypeWidget.value === "single" && selectedRows.size === 1 && headers.length > 0) {
             // Show the label (first column) for the selected row
             const idx = Array.from(selectedRows)[0];
-            if (rows[idx]) {
-                displayText = rows[idx][0] || `Row ${idx+1}`;
+            const row = getRow(idx);
+            if (row) {
+                displayText = row[0] || `Row ${idx+1}`;
             }
         }
         // Truncate preview if too long (by rendered width)
@@ -307,7 +348,7 @@ async function addCSVBrowserUI(node) {
 
     function getTotalRowsHeight() {
         const columns = Math.max(2, Math.floor((node.size[0] - SCROLLBAR_WIDTH) / MIN_COLUMN_WIDTH));
-        const rowCount = rows.length;
+        const rowCount = totalRows;
         const rowsPerCol = Math.ceil(rowCount / columns);
         return rowsPerCol * (ROW_HEIGHT + ROW_PADDING);
     }
@@ -317,7 +358,7 @@ async function addCSVBrowserUI(node) {
         ctx.fillRect(x, y, width, height);
         const columns = Math.max(2, Math.floor((node.size[0] - SCROLLBAR_WIDTH) / MIN_COLUMN_WIDTH));
         const columnWidth = (width - ROW_PADDING * (columns + 1)) / columns;
-        const rowCount = rows.length;
+        const rowCount = totalRows;
         const rowsPerCol = Math.ceil(rowCount / columns);
         const visibleHeight = height;
         const startRow = Math.floor(scrollOffset / (ROW_HEIGHT + ROW_PADDING));
@@ -325,9 +366,9 @@ async function addCSVBrowserUI(node) {
         for (let row = startRow; row < endRow; row++) {
             for (let col = 0; col < columns; col++) {
                 const rowIndex = row * columns + col;
-                if (rowIndex >= rows.length) break;
-                const rowData = rows[rowIndex];
-                const label = rowData[0] || `Row ${rowIndex+1}`;
+                if (rowIndex >= totalRows) break;
+                const rowData = getRow(rowIndex);
+                const label = rowData ? (rowData[0] || `Row ${rowIndex+1}`) : ELLIPSIS;
                 const xPos = x + EXTRA_ROW_PADDING + ROW_PADDING + col * (columnWidth + ROW_PADDING);
                 const yPos = y + EXTRA_ROW_PADDING + row * (ROW_HEIGHT + ROW_PADDING) + ROW_PADDING;
                 // Draw row background
@@ -363,10 +404,10 @@ async function addCSVBrowserUI(node) {
                 // Calculate which row was clicked
                 const columns = Math.max(2, Math.floor((this.size[0] - SCROLLBAR_WIDTH) / MIN_COLUMN_WIDTH));
                 const column = Math.floor(localX / ((this.size[0] - SCROLLBAR_WIDTH) / columns));
-                const rowsPerCol = Math.ceil(rows.length / columns);
+                const rowsPerCol = Math.ceil(totalRows / columns);
                 const row = Math.floor((localY - TOP_BAR_HEIGHT + scrollOffset) / (ROW_HEIGHT + ROW_PADDING));
                 const rowIndex = row * columns + column;
-                if (rowIndex >= 0 && rowIndex < rows.length) {
+                if (rowIndex >= 0 && rowIndex < totalRows) {
                     updateSelectedRows(rowIndex);
                 }
                 return true;
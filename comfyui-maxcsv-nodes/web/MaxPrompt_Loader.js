@@ -47,6 +47,7 @@ async function addFileBrowserUI(node) {
     const SELECTION_BORDER_RADIUS = 0;
     const SELECTION_BORDER_PADDING = 2;
     const ELLIPSIS = "...";
+    const THUMBNAIL_PAGE_SIZE = 100; // Thumbnails fetched per request
 
     const COLORS = {
         background: "#1e1e1e",
@@ -76,7 +77,7 @@ async function addFileBrowserUI(node) {
             const response = await fetch('/max_file_browser/get_directory_structure', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ path: currentDirectory, filter: filterText })
+                body: JSON.stringify({ path: currentDirectory, filter: filterText, depth: 1 })
             });
             
             if (!response.ok) {
@@ -101,20 +102,28 @@ async function addFileBrowserUI(node) {
 
     async function loadThumbnails() {
         thumbnails = {};
-        for (const file of files) {
+        // One request per page of files; the server answers from its thumbnail cache
+        for (let start = 0; start < files.length; start += THUMBNAIL_PAGE_SIZE) {
+            const page = files.slice(start, start + THUMBNAIL_PAGE_SIZE);
             try {
-                const imageFile = file.replace('.txt', '.png');
-                const response = await fetch('/max_file_browser/get_thumbnail', {
+                const response = await fetch('/max_file_browser/get_thumbnails', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ path: currentDirectory, file: imageFile })
+                    body: JSON.stringify({ path: currentDirectory, files: page })
                 });
-                if (response.ok) {
-                    const blob = await response.blob();
+                if (!response.ok) {
+                    const errorData = await response.json();
+                    console.error("Server error:", errorData.error);
+                    continue;
+                }
+                const data = await response.json();
+                for (const [file, dataUrl] of Object.entries(data.thumbnails || {})) {
+                    const blob = await (await fetch(dataUrl)).blob();
                     thumbnails[file] = await createImageBitmap(blob);
                 }
+                node.setDirtyCanvas(true);
             } catch (error) {
-                console.error(`Error loading thumbnail for ${file}:`, error);
+                console.error("Error loading thumbnails:", error);
             }
         }
     }
@@ -77,7 +77,7 @@ async function addTagBrowserUI(node) {
             const response = await fetch('/max_tag_browser/get_directory_structure', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ path: currentFile, filter: filterText })
+                body: JSON.stringify({ path: currentFile, filter: filterText, depth: 1 })
             });
             
             if (!response.ok) {
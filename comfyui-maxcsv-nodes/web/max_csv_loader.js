@@ -16,10 +16,13 @@ app.registerExtension({
           }
           const csv_file = this.widgets.find((w) => w.name === "csv_file").value;
           const selected_row = value;
-          const url = `/max_csv_browser/get_rows?csv_file=${csv_file}&selected_row=${selected_row}`;
+          // The preview page fetches the rows a page at a time
+          const url = new URL("./max_csv_loader.html", import.meta.url);
+          url.searchParams.set("csv_file", csv_file);
+          url.searchParams.set("selected_row", selected_row);
 
           const iframe = document.createElement("iframe");
-          iframe.src = url;
+          iframe.src = url.href;
           iframe.style.width = "100%";
           iframe.style.height = "400px";
           this.addDOMWidget("csv_preview", "iframe", iframe);